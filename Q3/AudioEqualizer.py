@@ -1,8 +1,15 @@
+import contextlib
+import struct
+import tempfile
 import tkinter as tk
 from tkinter import ttk, messagebox  # Added messagebox import
 import numpy as np
 from scipy.io import wavfile
 from scipy import fft
+from scipy.ndimage import minimum_filter1d
+
+# Number of samples handled at a time when limiting / writing output
+CHUNK_SIZE = 1 << 16
 
 
 class AudioEqualizerApp:
@@ -10,6 +17,8 @@ class AudioEqualizerApp:
         self.root = root
         self.root.title("Audio Equalizer")
         self.fft_data = None  # Store FFT data
+        self.spectrum = None  # SpectrumPyramid of the loaded file
+        self.view_range = None  # (f_lo, f_hi) shown on the spectrum canvas
 
         # Input file section
         input_frame = ttk.Frame(root, padding="10")
@@ -20,9 +29,19 @@ class AudioEqualizerApp:
         ttk.Entry(input_frame, textvariable=self.input_file, width=50).pack(side=tk.LEFT, padx=5)
         ttk.Button(input_frame, text="Load", command=self.load_audio).pack(side=tk.LEFT)
 
+        # Spectrum display (mouse wheel zooms around the cursor)
+        spectrum_frame = ttk.Frame(root, padding="10")
+        spectrum_frame.grid(row=1, column=0, columnspan=9, sticky="ew")
+        self.canvas = tk.Canvas(spectrum_frame, width=600, height=200, background="black")
+        self.canvas.pack(fill=tk.X)
+        self.canvas.bind("<Configure>", lambda event: self.draw_spectrum())
+        self.canvas.bind("<MouseWheel>", lambda event: self.zoom_spectrum(event.x, event.delta > 0))
+        self.canvas.bind("<Button-4>", lambda event: self.zoom_spectrum(event.x, True))
+        self.canvas.bind("<Button-5>", lambda event: self.zoom_spectrum(event.x, False))
+
         # Equalizer sliders section
         slider_frame = ttk.Frame(root, padding="10")
-        slider_frame.grid(row=1, column=0, columnspan=9)
+        slider_frame.grid(row=2, column=0, columnspan=9)
 
         # Frequencies for each slider
         self.frequencies = ['63', '125', '250', '500', '1k', '2k', '4k', '8k', '16k']
@@ -32,7 +51,8 @@ class AudioEqualizerApp:
             frame = ttk.Frame(slider_frame)
             frame.grid(row=0, column=i, padx=10)
 
-            slider = ttk.Scale(frame, from_=10, to=-10, length=200, orient='vertical')
+            slider = ttk.Scale(frame, from_=10, to=-10, length=200, orient='vertical',
+                               command=lambda value: self.on_slider_change())
             slider.set(0)
             slider.grid(row=0, column=0)
             self.sliders.append(slider)
@@ -41,29 +61,31 @@ class AudioEqualizerApp:
 
         # Output file section
         output_frame = ttk.Frame(root, padding="10")
-        output_frame.grid(row=2, column=0, columnspan=9, sticky="ew")
+        output_frame.grid(row=3, column=0, columnspan=9, sticky="ew")
 
         ttk.Label(output_frame, text="Output File Name:").pack(side=tk.LEFT)
         self.output_file = tk.StringVar()
         ttk.Entry(output_frame, textvariable=self.output_file, width=50).pack(side=tk.LEFT, padx=5)
+        self.normalize = tk.BooleanVar(value=False)
+        ttk.Checkbutton(output_frame, text="Normalize", variable=self.normalize).pack(side=tk.LEFT, padx=5)
         ttk.Button(output_frame, text="Process", command=self.process_audio).pack(side=tk.LEFT)
 
         # Message box
         message_frame = ttk.Frame(root, padding="10")
-        message_frame.grid(row=3, column=0, columnspan=9)
+        message_frame.grid(row=4, column=0, columnspan=9)
         self.message_var = tk.StringVar()
         self.message_var.set("Status: Ready")
         ttk.Label(message_frame, textvariable=self.message_var, width=50).pack()
 
         # Exit button
         exit_frame = ttk.Frame(root, padding="10")
-        exit_frame.grid(row=4, column=0, columnspan=9)
+        exit_frame.grid(row=5, column=0, columnspan=9)
         ttk.Button(exit_frame, text="Exit", command=root.destroy).pack()
 
     def load_audio(self):
         try:
             # Read audio file
-            sample_rate, audio_data = wavfile.read(self.input_file.get())
+            sample_rate, audio_data = read_wav(self.input_file.get())
 
             # Convert to mono if stereo
             if len(audio_data.shape) > 1:
@@ -72,6 +94,13 @@ class AudioEqualizerApp:
             # Perform FFT
             self.fft_data = fft.fft(audio_data)
             self.sample_rate = sample_rate
+            self.input_dtype = audio_data.dtype
+
+            # Summarise the spectrum once so redraws never touch the raw bins
+            self.spectrum = SpectrumPyramid(self.fft_data, sample_rate)
+            self.spectrum.set_gains([slider.get() for slider in self.sliders])
+            self.view_range = (self.spectrum.f_min, self.spectrum.f_max)
+            self.draw_spectrum()
 
             self.message_var.set("Status: Audio file loaded successfully!")
 
@@ -79,6 +108,49 @@ class AudioEqualizerApp:
             self.message_var.set(f"Error: Failed to load audio file - {str(e)}")
             messagebox.showerror("Error", f"Failed to load audio file: {str(e)}")
 
+    def on_slider_change(self):
+        if self.spectrum is None:
+            return
+        if self.spectrum.set_gains([slider.get() for slider in self.sliders]):
+            self.draw_spectrum()
+
+    def _x_to_freq(self, x, width):
+        f_lo, f_hi = self.view_range
+        return f_lo * (f_hi / f_lo) ** (x / max(1, width - 1))
+
+    def zoom_spectrum(self, x, zoom_in):
+        if self.spectrum is None:
+            return
+        width = self.canvas.winfo_width()
+        center = self._x_to_freq(x, width)
+        f_lo, f_hi = self.view_range
+        factor = 0.8 if zoom_in else 1.25
+        # Zoom in log-frequency space, keeping the frequency under the cursor fixed
+        f_lo = max(self.spectrum.f_min, center * (f_lo / center) ** factor)
+        f_hi = min(self.spectrum.f_max, center * (f_hi / center) ** factor)
+        if f_hi / f_lo > 1.01:
+            self.view_range = (f_lo, f_hi)
+            self.draw_spectrum()
+
+    def draw_spectrum(self):
+        self.canvas.delete("spectrum")
+        if self.spectrum is None:
+            return
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        f_lo, f_hi = self.view_range
+        freqs, mags = self.spectrum.view(f_lo, f_hi, width)
+        if len(freqs) < 2:
+            return
+
+        # Log frequency on x, dB (60 dB range below the peak) on y
+        x = np.log(freqs / f_lo) / np.log(f_hi / f_lo) * (width - 1)
+        db = 20 * np.log10(np.maximum(mags, 1e-12))
+        top = 20 * np.log10(max(self.spectrum.peak, 1e-12))
+        y = (top - db) / 60 * (height - 1)
+        points = np.column_stack([x, np.clip(y, 0, height - 1)]).ravel().tolist()
+        self.canvas.create_line(*points, fill="lime", tags="spectrum")
+
     def process_audio(self):
         if self.fft_data is None:
             self.message_var.set("Error: Please load an audio file first!")
@@ -90,7 +162,9 @@ class AudioEqualizerApp:
 
         try:
             # Call processing function
-            process_audio_file(self.fft_data, slider_values, self.sample_rate, self.output_file.get())
+            mode = "normalize" if self.normalize.get() else "limit"
+            process_audio_file(self.fft_data, slider_values, self.sample_rate, self.output_file.get(),
+                               mode=mode, input_dtype=self.input_dtype)
             self.message_var.set("Status: Audio processed successfully!")
             messagebox.showinfo("Success", "Audio processed successfully!")
 
@@ -99,34 +173,349 @@ class AudioEqualizerApp:
             messagebox.showerror("Error", f"Failed to process audio: {str(e)}")
 
 
-def process_audio_file(fft_data, slider_values, sample_rate, output_file):
+def read_wav(path):
+    """Read a WAV file memory-mapped when the format allows it (falls back to a plain read)."""
+    try:
+        return wavfile.read(path, mmap=True)
+    except ValueError:
+        # e.g. 24-bit PCM, which scipy can only decode into memory
+        return wavfile.read(path)
+
+
+class IncrementalWavWriter:
+    """
+    Write a 16-bit PCM WAV file frame block by frame block.
+
+    The RIFF and data chunk sizes are written as 0 up front and patched in
+    close(), so the whole signal never has to be in memory at once.
+    """
+
+    HEADER = struct.Struct('<4sI4s4sIHHIIHH4sI')
+    MAX_DATA_BYTES = 0xFFFFFFFF - 36  # RIFF sizes are 32-bit
+
+    def __init__(self, path, sample_rate, channels=1):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames = 0
+        self._file = open(path, 'wb')
+        self._write_header(0)
+
+    def _write_header(self, data_bytes):
+        block_align = self.channels * 2
+        self._file.write(self.HEADER.pack(
+            b'RIFF', 36 + data_bytes, b'WAVE',
+            b'fmt ', 16, 1, self.channels, self.sample_rate,
+            self.sample_rate * block_align, block_align, 16,
+            b'data', data_bytes))
+
+    @property
+    def data_bytes(self):
+        return self.frames * self.channels * 2
+
+    def write_frames(self, frames):
+        """Append int16 frames, shaped (n,) for mono or (n, channels)."""
+        frames = np.asarray(frames, dtype='<i2')
+        if frames.ndim != (1 if self.channels == 1 else 2) or frames.shape[1:] not in ((), (self.channels,)):
+            raise ValueError(f"Expected frames for {self.channels} channel(s), got shape {frames.shape}")
+        if self.data_bytes + frames.nbytes > self.MAX_DATA_BYTES:
+            raise ValueError("WAV data would exceed the 4 GiB RIFF size limit")
+        self._file.write(frames.tobytes())
+        self.frames += len(frames)
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.seek(0)
+        self._write_header(self.data_bytes)
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# Fixed frequency bands (Hz) controlled by the sliders
+BANDS = [(0, 63), (64, 125), (126, 250), (251, 500),
+         (501, 1000), (1001, 2000), (2001, 4000),
+         (4001, 8000), (8001, 16000)]
+
+
+def slider_to_scale(slider_values):
     # Map slider values from [-10, 10] to scaling factors [0, 10]
-    scale_factors = [max(0, (val + 10) / 2) for val in slider_values]
+    return [max(0, (val + 10) / 2) for val in slider_values]
+
+
+def band_index(freqs):
+    """Return the index of the band each frequency falls in, or -1 for none."""
+    freqs = np.abs(freqs)
+    index = np.full(len(freqs), -1)
+    for i, band in enumerate(BANDS):
+        index[(freqs >= band[0]) & (freqs <= band[1])] = i
+    return index
+
+
+class SpectrumPyramid:
+    """
+    Multi-resolution log-frequency magnitude summary of an FFT, for drawing.
+
+    Level 0 holds the peak magnitude of the FFT bins in each of about
+    base_cells log-spaced cells (split at band edges, so every cell lies in at
+    most one band); each higher level halves the resolution by taking the max
+    of neighbouring cells. view() answers from the coarsest level that still
+    has a cell per pixel, so a redraw costs O(pixels) rather than O(bins), and
+    set_band_gain() only recomputes the cells of that band on every level.
+    """
+
+    def __init__(self, fft_data, sample_rate, base_cells=4096, f_min=20.0):
+        n = len(fft_data)
+        half = n // 2 + 1
+        bin_freqs = np.arange(half) * sample_rate / n
+        self.f_max = sample_rate / 2
+        self.f_min = min(f_min, self.f_max / 2)
+
+        # Cell boundaries (as bin indices): log-spaced edges plus band transitions
+        first = max(1, int(np.ceil(self.f_min * n / sample_rate)))
+        log_edges = np.geomspace(self.f_min, self.f_max, base_cells + 1) * n / sample_rate
+        bands = band_index(bin_freqs)
+        band_edges = np.flatnonzero(np.diff(bands)) + 1
+        starts = np.unique(np.concatenate([np.round(log_edges).astype(int), band_edges]))
+        starts = starts[(starts >= first) & (starts < half)]
+        if len(starts) == 0 or starts[0] != first:
+            starts = np.concatenate([[first], starts])
+
+        self.base = np.maximum.reduceat(np.abs(fft_data[:half]), starts)
+        self.freqs = bin_freqs[starts]
+        self.cell_band = bands[starts]
+        # Contiguous [lo, hi) range of level-0 cells in each band
+        self.band_ranges = []
+        for i in range(len(BANDS)):
+            cells = np.flatnonzero(self.cell_band == i)
+            self.band_ranges.append((int(cells[0]), int(cells[-1]) + 1) if len(cells) else (0, 0))
+        self.gains = np.ones(len(BANDS))
+
+        self.levels = [self.base.copy()]
+        while len(self.levels[-1]) > 1:
+            self.levels.append(self._merge(self.levels[-1], 0, (len(self.levels[-1]) + 1) // 2))
+
+    @staticmethod
+    def _merge(child, lo, hi):
+        """Max of child cell pairs for parent cells [lo, hi)."""
+        pairs = child[2 * lo:2 * hi]
+        return np.maximum.reduceat(pairs, np.arange(0, len(pairs), 2))
+
+    @property
+    def peak(self):
+        """Largest magnitude with the current gains (the single top-level cell)."""
+        return float(self.levels[-1][0])
+
+    def set_band_gain(self, band, gain):
+        """Scale one band by a linear gain, touching only that band's cells."""
+        lo, hi = self.band_ranges[band]
+        self.gains[band] = gain
+        if lo >= hi:
+            return
+        self.levels[0][lo:hi] = self.base[lo:hi] * gain
+        for level in range(1, len(self.levels)):
+            lo, hi = lo // 2, (hi - 1) // 2 + 1
+            self.levels[level][lo:hi] = self._merge(self.levels[level - 1], lo, hi)
+
+    def set_gains(self, slider_values):
+        """Apply slider values; return the bands whose gain actually changed."""
+        changed = []
+        for band, gain in enumerate(slider_to_scale(slider_values)):
+            if gain != self.gains[band]:
+                self.set_band_gain(band, gain)
+                changed.append(band)
+        return changed
+
+    def view(self, f_lo, f_hi, width):
+        """Return (freqs, magnitudes) covering [f_lo, f_hi] with roughly width points."""
+        i0 = max(0, int(np.searchsorted(self.freqs, f_lo, side='right')) - 1)
+        i1 = int(np.searchsorted(self.freqs, f_hi, side='right'))
+        count = i1 - i0
+        level = 0
+        while level + 1 < len(self.levels) and count >> (level + 1) >= width:
+            level += 1
+        lo, hi = i0 >> level, ((i1 - 1) >> level) + 1
+        return self.freqs[lo << level:hi << level:1 << level], self.levels[level][lo:hi]
+
+
+def apply_band_gains(fft_data, slider_values, sample_rate):
+    """Return a copy of fft_data with each band scaled by its slider value."""
+    scale_factors = slider_to_scale(slider_values)
 
     # Compute FFT frequency bins
     N = len(fft_data)
-    freqs = np.fft.fftfreq(N, d=1 / sample_rate)
-
-    # Define fixed frequency bands
-    bands = [(0, 63), (64, 125), (126, 250), (251, 500),
-             (501, 1000), (1001, 2000), (2001, 4000),
-             (4001, 8000), (8001, 16000)]
+    freqs = np.abs(np.fft.fftfreq(N, d=1 / sample_rate))
 
     # Apply the scaling factors to the FFT coefficients in each band
     fft_data_mod = fft_data.copy()
-    for band, factor in zip(bands, scale_factors):
-        indices = np.where((np.abs(freqs) >= band[0]) & (np.abs(freqs) <= band[1]))
+    for band, factor in zip(BANDS, scale_factors):
+        indices = np.where((freqs >= band[0]) & (freqs <= band[1]))
         fft_data_mod[indices] *= factor
-
-    # Compute inverse FFT to get the time-domain signal
-    processed_signal = np.real(fft.ifft(fft_data_mod))
-
-    # Normalize to prevent clipping when saving as 16-bit PCM
-    processed_signal = processed_signal / np.max(np.abs(processed_signal)) * 32767
-    processed_signal = processed_signal.astype(np.int16)
-
-    # Save the processed audio file
-    wavfile.write(output_file, sample_rate, processed_signal)
+    return fft_data_mod
+
+
+def inverse_fft(fft_data):
+    """Compute inverse FFT to get the time-domain signal."""
+    return np.real(fft.ifft(fft_data))
+
+
+def normalize_two_pass(signal, chunk_size=CHUNK_SIZE):
+    """
+    Yield int16 chunks of signal scaled so its global peak hits full scale.
+
+    The first pass only finds the peak and the second pass scales and
+    converts, one chunk at a time, so signal can be an np.memmap. A silent
+    signal gives zeros.
+    """
+    peak = 0.0
+    for start in range(0, len(signal), chunk_size):
+        peak = max(peak, float(np.max(np.abs(signal[start:start + chunk_size]))))
+
+    for start in range(0, len(signal), chunk_size):
+        chunk = signal[start:start + chunk_size]
+        if peak == 0:
+            yield np.zeros(len(chunk), dtype=np.int16)
+        else:
+            yield (chunk / peak * 32767).astype(np.int16)
+
+
+class LookaheadLimiter:
+    """
+    Streaming lookahead peak limiter.
+
+    Feed chunks of samples (1-D, or 2-D frames x channels) to process(); each
+    call returns as many limited samples as it was given, delayed by the
+    lookahead, and flush() returns the remaining tail. The gain is lowered
+    with a linear ramp that starts `lookahead` samples before a peak and is
+    released with the same ramp afterwards, so |output| never exceeds ceiling
+    and memory is bounded by the chunk size.
+    """
+
+    def __init__(self, sample_rate, lookahead_ms=5.0, ceiling=32767):
+        self.lookahead = max(1, int(sample_rate * lookahead_ms / 1000))
+        self.ceiling = ceiling
+        delay = self.lookahead - 1
+        self._gain_tail = np.ones(2 * delay)  # required gains of the last 2*delay samples
+        self._min_tail = np.ones(delay)       # windowed minimum of the last delay samples
+        self._sample_tail = None              # samples not yet output (created on first chunk)
+        self._skip = delay                    # leading samples of silence to drop
+
+    def process(self, chunk):
+        chunk = np.asarray(chunk, dtype=np.float64)
+        delay = self.lookahead - 1
+        if self._sample_tail is None:
+            self._sample_tail = np.zeros((delay,) + chunk.shape[1:])
+        if len(chunk) == 0:
+            return chunk
+
+        # Gain each sample needs on its own to stay under the ceiling
+        peak = np.abs(chunk) if chunk.ndim == 1 else np.abs(chunk).max(axis=1)
+        with np.errstate(divide='ignore'):
+            required = np.minimum(1.0, self.ceiling / peak)
+
+        # Minimum over a centred window of 2*lookahead-1 samples...
+        gains = np.concatenate([self._gain_tail, required])
+        window_min = minimum_filter1d(gains, size=2 * delay + 1)[delay:len(gains) - delay]
+
+        # ...then a moving average over lookahead samples, which stays below the
+        # required gain of every sample it covers
+        mins = np.concatenate([self._min_tail, window_min])
+        csum = np.concatenate([[0.0], np.cumsum(mins)])
+        gain = (csum[self.lookahead:] - csum[:-self.lookahead]) / self.lookahead
+
+        samples = np.concatenate([self._sample_tail, chunk])
+        out = samples[:len(chunk)] * (gain if chunk.ndim == 1 else gain[:, None])
+        out = np.clip(out, -self.ceiling, self.ceiling)
+
+        self._gain_tail = gains[len(gains) - 2 * delay:]
+        self._min_tail = mins[len(mins) - delay:]
+        self._sample_tail = samples[len(samples) - delay:]
+
+        skip = min(self._skip, len(out))
+        self._skip -= skip
+        return out[skip:]
+
+    def flush(self):
+        """Return the samples still held back by the lookahead."""
+        if self._sample_tail is None:
+            return np.zeros(0)
+        return self.process(np.zeros_like(self._sample_tail))
+
+    def limit(self, signal, chunk_size=CHUNK_SIZE, gain=1.0):
+        """Yield int16 chunks of signal, multiplied by gain, limited to the ceiling."""
+        for start in range(0, len(signal), chunk_size):
+            out = self.process(signal[start:start + chunk_size] * gain)
+            if len(out):
+                yield out.astype(np.int16)
+        yield self.flush().astype(np.int16)
+
+
+def full_scale(dtype):
+    """Full-scale amplitude of samples of this dtype as read_wav returns them (1.0 for float)."""
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'f':
+        return 1.0
+    # 24-bit PCM is returned as left-justified int32, so 2**31 covers it too
+    return float(2 ** (dtype.itemsize * 8 - 1))
+
+
+def limiter_gain(input_dtype):
+    """
+    Gain from the equalized signal to int16 PCM before limiting.
+
+    Divides out the input's full scale and the gain of a flat slider
+    (slider_to_scale maps 0 to x5), so flat sliders reproduce the input
+    level and only boosted bands can reach the limiter.
+    """
+    return 32768 / (full_scale(input_dtype) * slider_to_scale([0])[0])
+
+
+def process_audio_file(fft_data, slider_values, sample_rate, output_file, mode="limit",
+                       chunk_size=CHUNK_SIZE, input_dtype=np.int16):
+    """
+    Apply the slider gains and save the result as 16-bit PCM.
+
+    mode="limit" rescales the signal from input_dtype's full scale to int16
+    (see limiter_gain) and runs it through a LookaheadLimiter chunk by chunk,
+    so a single transient only ducks the samples around it. mode="normalize"
+    spills the signal to a temporary memory-mapped file and scales it by its
+    global peak in two passes. Either way the output is written incrementally
+    with IncrementalWavWriter; only the spectrum itself has to fit in memory.
+    """
+    # Passed without a name, so write_output holds the only reference to the signal
+    write_output(inverse_fft(apply_band_gains(fft_data, slider_values, sample_rate)),
+                 sample_rate, output_file, mode, chunk_size, input_dtype)
+
+
+def write_output(processed_signal, sample_rate, output_file, mode="limit", chunk_size=CHUNK_SIZE,
+                 input_dtype=np.int16):
+    """
+    Output stage of process_audio_file: convert the equalized signal to int16 and write it chunk by chunk.
+
+    In normalize mode the signal is freed once spilled, provided the caller
+    does not keep its own reference to it.
+    """
+    with contextlib.ExitStack() as stack:
+        if mode == "limit":
+            chunks = LookaheadLimiter(sample_rate).limit(processed_signal, chunk_size, limiter_gain(input_dtype))
+        elif mode == "normalize":
+            spill = stack.enter_context(tempfile.TemporaryFile())
+            signal = np.memmap(spill, dtype=np.float32, mode='w+', shape=processed_signal.shape)
+            for start in range(0, len(signal), chunk_size):
+                signal[start:start + chunk_size] = processed_signal[start:start + chunk_size]
+            del processed_signal
+            chunks = normalize_two_pass(signal, chunk_size)
+        else:
+            raise ValueError(f"Unknown output mode: {mode}")
+
+        # Save the processed audio file as the chunks are produced
+        with IncrementalWavWriter(output_file, sample_rate) as writer:
+            for chunk in chunks:
+                writer.write_frames(chunk)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,257 @@
+"""
+Benchmark suite for the equalizer pipeline (load_audio + process_audio_file).
+
+Generates synthetic WAV files for every combination of sample rate, duration
+and channel count, then times each stage of the pipeline separately and
+records its peak RSS. On Linux the RSS high-water mark is reset before each
+stage (/proc/self/clear_refs), so the figure is the stage's own peak;
+elsewhere it is the running peak of the process. Every configuration runs in
+its own child process so peak RSS figures do not leak between runs. Input is
+memory-mapped as in load_audio, so page-in cost shows up in the fft stage
+rather than in wav_read.
+
+Usage:
+    python benchmark_equalizer.py                       # quick preset
+    python benchmark_equalizer.py --full                # seconds to hours
+    python benchmark_equalizer.py --rates 44100 --durations 1 60 --output bench.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import resource
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+from AudioEqualizer import apply_band_gains, read_wav, write_output
+
+SAMPLE_RATES = [22050, 44100, 48000, 96000]
+QUICK_DURATIONS = [1, 10, 60]
+FULL_DURATIONS = [1, 10, 60, 600, 3600]
+CHANNELS = [1, 2]
+
+# "output" is process_audio_file's output stage (write_output): int16 conversion and
+# WAV writing are interleaved chunk by chunk, so they are timed together
+STAGES = ["wav_read", "fft", "band_scaling", "ifft", "output"]
+
+# Slider positions used for every run (a mild "smile" curve)
+SLIDER_VALUES = [4, 2, 0, -2, -3, -2, 0, 2, 4]
+
+
+def _fft_engine(name):
+    """Return (fft, ifft) functions for the requested engine."""
+    if name == "scipy":
+        from scipy import fft as engine
+    elif name == "numpy":
+        engine = np.fft
+    else:
+        raise ValueError(f"Unknown FFT engine: {name}")
+    return engine.fft, engine.ifft
+
+
+def _reset_peak_rss():
+    """Reset the process RSS high-water mark (Linux only). Returns whether it worked."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_bytes():
+    """VmHWM from /proc/self/status where available (resettable), else ru_maxrss."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is reported in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def generate_wav(path, sample_rate, duration, channels, chunk_seconds=10):
+    """Write a synthetic int16 WAV (tones spread over the bands plus noise) in chunks."""
+    rng = np.random.default_rng(0)
+    tones = np.array([50, 100, 200, 400, 800, 1600, 3200, 6400, 12800], dtype=np.float64)
+    tones = tones[tones < sample_rate / 2]
+    total = int(sample_rate * duration)
+    chunk = int(sample_rate * chunk_seconds)
+
+    with wave.open(path, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        for start in range(0, total, chunk):
+            t = np.arange(start, min(start + chunk, total)) / sample_rate
+            signal = np.sin(2 * np.pi * tones[:, None] * t).sum(axis=0) / len(tones)
+            signal += 0.05 * rng.standard_normal(len(t))
+            frames = np.repeat(signal[:, None], channels, axis=1)
+            w.writeframes((frames * 16000).astype("<i2").tobytes())
+
+
+def run_pipeline(input_file, output_file, engine="scipy", mode="limit"):
+    """
+    Run every pipeline stage once and return per-stage timings and peak RSS.
+
+    peak_rss_scope tells whether peak_rss_bytes is the stage's own peak
+    ("stage", Linux) or the running peak of the whole process ("process").
+    """
+    fft_func, ifft_func = _fft_engine(engine)
+    stages = {}
+    state = {}
+
+    def timed(name, func):
+        # Where the high-water mark can be reset the peak is the stage's own;
+        # otherwise it is the running peak of the process so far
+        reset = _reset_peak_rss()
+        start = time.perf_counter()
+        result = func()
+        stages[name] = {
+            "seconds": time.perf_counter() - start,
+            "peak_rss_bytes": _peak_rss_bytes(),
+            "peak_rss_scope": "stage" if reset else "process",
+        }
+        return result
+
+    def read():
+        sample_rate, audio_data = read_wav(input_file)
+        # Convert to mono if stereo, as load_audio does
+        if len(audio_data.shape) > 1:
+            audio_data = audio_data[:, 0]
+        state["sample_rate"] = sample_rate
+        state["dtype"] = audio_data.dtype
+        return audio_data
+
+    audio_data = timed("wav_read", read)
+    sample_rate = state["sample_rate"]
+    fft_data = timed("fft", lambda: fft_func(audio_data))
+    del audio_data
+    fft_mod = timed("band_scaling", lambda: apply_band_gains(fft_data, SLIDER_VALUES, sample_rate))
+    del fft_data
+    state["signal"] = timed("ifft", lambda: np.real(ifft_func(fft_mod)))
+    del fft_mod
+    # Hand over the only reference, as process_audio_file does
+    timed("output", lambda: write_output(state.pop("signal"), sample_rate, output_file, mode,
+                                         input_dtype=state["dtype"]))
+    return stages
+
+
+def _child(results, input_file, output_file, engine, mode):
+    try:
+        results.put({"stages": run_pipeline(input_file, output_file, engine, mode)})
+    except Exception as e:  # report Python-level failures such as MemoryError
+        results.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def _wait_for_result(process, results, poll_seconds=1.0):
+    """
+    Return what the child put on results, or an error record if it died first.
+
+    A child killed by a signal (e.g. SIGKILL from the OOM killer) never reaches
+    the except clause in _child, so the queue is polled while checking that
+    the child is still alive.
+    """
+    while True:
+        try:
+            return results.get(timeout=poll_seconds)
+        except queue.Empty:
+            if process.is_alive():
+                continue
+        # The child has exited; it may still have reported just before that
+        try:
+            return results.get(timeout=poll_seconds)
+        except queue.Empty:
+            process.join()
+            return {"error": f"exit code {process.exitcode}"}
+
+
+def benchmark_config(workdir, sample_rate, duration, channels, engine, mode):
+    """Generate one input file and benchmark it in a fresh child process."""
+    input_file = os.path.join(workdir, f"in_{sample_rate}_{duration}_{channels}.wav")
+    output_file = os.path.join(workdir, "out.wav")
+
+    start = time.perf_counter()
+    generate_wav(input_file, sample_rate, duration, channels)
+    generate_seconds = time.perf_counter() - start
+
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_child, args=(results, input_file, output_file, engine, mode))
+    process.start()
+    result = _wait_for_result(process, results)
+    process.join()
+
+    record = {
+        "sample_rate": sample_rate,
+        "duration_seconds": duration,
+        "channels": channels,
+        "samples": int(sample_rate * duration),
+        "engine": engine,
+        "mode": mode,
+        "input_bytes": os.path.getsize(input_file),
+        "generate_seconds": generate_seconds,
+    }
+    record.update(result)
+    if "stages" in result:
+        record["total_seconds"] = sum(s["seconds"] for s in result["stages"].values())
+        record["peak_rss_bytes"] = max(s["peak_rss_bytes"] for s in result["stages"].values())
+
+    for path in (input_file, output_file):
+        if os.path.exists(path):
+            os.remove(path)
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the audio equalizer pipeline.")
+    parser.add_argument("--rates", type=int, nargs="+", default=SAMPLE_RATES)
+    parser.add_argument("--durations", type=float, nargs="+", default=None,
+                        help="Durations in seconds (default: quick preset)")
+    parser.add_argument("--channels", type=int, nargs="+", default=CHANNELS)
+    parser.add_argument("--full", action="store_true", help="Use durations from seconds up to one hour")
+    parser.add_argument("--engine", default="scipy", choices=["scipy", "numpy"])
+    parser.add_argument("--mode", default="limit", choices=["limit", "normalize"],
+                        help="Output stage of process_audio_file to benchmark")
+    parser.add_argument("--workdir", default=None, help="Directory for the synthetic WAV files")
+    parser.add_argument("--output", default=None, help="Write JSON results to this file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    durations = args.durations or (FULL_DURATIONS if args.full else QUICK_DURATIONS)
+
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        for sample_rate in args.rates:
+            for duration in durations:
+                for channels in args.channels:
+                    record = benchmark_config(workdir, sample_rate, duration, channels,
+                                              args.engine, args.mode)
+                    results.append(record)
+                    summary = record.get("error") or f"{record['total_seconds']:.3f} s"
+                    print(f"[*] {sample_rate} Hz, {duration} s, {channels} ch: {summary}", file=sys.stderr)
+
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "stages": STAGES,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+import warnings
+
+import numpy as np
+from scipy import fft
+from scipy.io import wavfile
+
+from AudioEqualizer import (IncrementalWavWriter, LookaheadLimiter, SpectrumPyramid, apply_band_gains,
+                            normalize_two_pass, process_audio_file, read_wav)
+from benchmark_equalizer import (STAGES, _peak_rss_bytes, _reset_peak_rss, _wait_for_result, generate_wav,
+                                 run_pipeline)
+
+
+class TestAudioEqualizer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.sample_rate = 8000
+        t = np.arange(self.sample_rate) / self.sample_rate
+        self.signal = (np.sin(2 * np.pi * 100 * t) + np.sin(2 * np.pi * 1500 * t)) * 8000
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def test_flat_sliders_keep_signal_shape(self):
+        """Sliders at 0 scale every band by the same factor."""
+        fft_data = fft.fft(self.signal)
+        fft_mod = apply_band_gains(fft_data, [0] * 9, self.sample_rate)
+        np.testing.assert_allclose(fft_mod, fft_data * 5)
+
+    def test_band_gain_only_touches_its_band(self):
+        """Muting the 125 Hz band removes the 100 Hz tone and keeps the 1.5 kHz one."""
+        fft_data = fft.fft(self.signal)
+        sliders = [0, -10, 0, 0, 0, 0, 0, 0, 0]
+        spectrum = np.abs(apply_band_gains(fft_data, sliders, self.sample_rate))
+        self.assertAlmostEqual(spectrum[100], 0.0, places=6)
+        self.assertAlmostEqual(spectrum[1500], np.abs(fft_data[1500]) * 5, places=3)
+
+    def test_process_audio_file_normalize_mode(self):
+        """mode="normalize" writes int16 PCM peaking at full scale."""
+        output_file = self.path("out.wav")
+        process_audio_file(fft.fft(self.signal), [0] * 9, self.sample_rate, output_file, mode="normalize")
+        sample_rate, data = wavfile.read(output_file)
+        self.assertEqual(sample_rate, self.sample_rate)
+        self.assertEqual(data.dtype, np.int16)
+        self.assertEqual(len(data), len(self.signal))
+        self.assertEqual(np.max(np.abs(data)), 32767)
+
+    def test_process_audio_file_limit_mode(self):
+        """The default limiter keeps the length and stays within int16 range."""
+        output_file = self.path("out.wav")
+        process_audio_file(fft.fft(self.signal), [10] * 9, self.sample_rate, output_file)
+        _, data = wavfile.read(output_file)
+        self.assertEqual(data.dtype, np.int16)
+        self.assertEqual(len(data), len(self.signal))
+        self.assertGreater(np.max(np.abs(data)), 30000)
+
+    def test_limit_mode_float_input_keeps_level(self):
+        """Float WAV samples (full scale 1.0) peaking at 0.5 come out at half of int16 full scale."""
+        signal = (self.signal / np.max(np.abs(self.signal)) * 0.5).astype(np.float32)
+        output_file = self.path("out.wav")
+        process_audio_file(fft.fft(signal), [0] * 9, self.sample_rate, output_file, input_dtype=signal.dtype)
+        _, data = wavfile.read(output_file)
+        self.assertAlmostEqual(np.max(np.abs(data)) / 16384, 1.0, places=2)
+
+    def test_limit_mode_flat_sliders_reproduce_loud_int16(self):
+        """Flat sliders leave loud int16 input unchanged, quiet passages included."""
+        signal = self.signal / np.max(np.abs(self.signal)) * 32000
+        signal[:4000] *= 0.1  # a passage 20 dB below the rest
+        signal = signal.astype(np.int16)
+        output_file = self.path("out.wav")
+        process_audio_file(fft.fft(signal), [0] * 9, self.sample_rate, output_file, input_dtype=signal.dtype)
+        _, data = wavfile.read(output_file)
+        np.testing.assert_allclose(data, signal, atol=2)
+        level = 20 * np.log10(np.max(np.abs(data[4000:])) / np.max(np.abs(data[:4000])))
+        self.assertAlmostEqual(level, 20, delta=0.2)
+
+    def test_limit_mode_int32_input(self):
+        """24/32-bit PCM (read as int32) is scaled down, not crushed to the ceiling."""
+        signal = (self.signal / np.max(np.abs(self.signal)) * 2 ** 30).astype(np.int32)
+        output_file = self.path("out.wav")
+        process_audio_file(fft.fft(signal), [0] * 9, self.sample_rate, output_file, input_dtype=signal.dtype)
+        _, data = wavfile.read(output_file)
+        np.testing.assert_allclose(data, signal / 65536, atol=2)
+
+    def test_normalize_two_pass_matches_global_normalization(self):
+        """Two-pass chunked normalization equals the one-shot version."""
+        chunks = list(normalize_two_pass(self.signal, chunk_size=1000))
+        self.assertEqual(len(chunks), 8)
+        expected = (self.signal / np.max(np.abs(self.signal)) * 32767).astype(np.int16)
+        np.testing.assert_array_equal(np.concatenate(chunks), expected)
+
+    def test_normalize_silence_gives_zeros(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            chunks = list(normalize_two_pass(np.zeros(2500), chunk_size=1000))
+        self.assertEqual([len(chunk) for chunk in chunks], [1000, 1000, 500])
+        self.assertFalse(np.concatenate(chunks).any())
+
+    def test_limiter_is_transparent_below_ceiling(self):
+        """Quiet input passes through unchanged, just with the latency removed."""
+        limiter = LookaheadLimiter(self.sample_rate, ceiling=32767)
+        out = np.concatenate([limiter.process(self.signal[:3000]),
+                              limiter.process(self.signal[3000:]),
+                              limiter.flush()])
+        np.testing.assert_allclose(out, self.signal)
+
+    def test_limiter_caps_transient_locally(self):
+        """A single spike is limited without ducking the rest of the signal."""
+        signal = self.signal.copy()
+        signal[4000] = 100000
+        limiter = LookaheadLimiter(self.sample_rate, lookahead_ms=5.0)
+        out = np.concatenate([limiter.process(signal), limiter.flush()])
+        self.assertLessEqual(np.max(np.abs(out)), 32767)
+        np.testing.assert_allclose(out[:3900], signal[:3900])
+        np.testing.assert_allclose(out[4100:], signal[4100:])
+
+    def test_limiter_output_independent_of_chunking(self):
+        """Chunk boundaries do not change the limited output (stereo input)."""
+        stereo = np.stack([self.signal * 3, self.signal * -2], axis=1)
+        whole = LookaheadLimiter(self.sample_rate, ceiling=20000)
+        expected = np.concatenate([whole.process(stereo), whole.flush()])
+
+        chunked = LookaheadLimiter(self.sample_rate, ceiling=20000)
+        out = np.concatenate([chunked.process(stereo[i:i + 777]) for i in range(0, len(stereo), 777)]
+                             + [chunked.flush()])
+        self.assertEqual(out.shape, stereo.shape)
+        self.assertLessEqual(np.max(np.abs(out)), 20000)
+        np.testing.assert_allclose(out, expected)
+
+    def test_incremental_writer_round_trip(self):
+        """Frames appended in blocks read back as one valid WAV file."""
+        output_file = self.path("stereo.wav")
+        frames = (np.stack([self.signal, -self.signal], axis=1) / 2).astype(np.int16)
+        with IncrementalWavWriter(output_file, self.sample_rate, channels=2) as writer:
+            for start in range(0, len(frames), 3000):
+                writer.write_frames(frames[start:start + 3000])
+        self.assertEqual(writer.frames, len(frames))
+        self.assertEqual(os.path.getsize(output_file), 44 + frames.nbytes)
+
+        sample_rate, data = wavfile.read(output_file)
+        self.assertEqual(sample_rate, self.sample_rate)
+        np.testing.assert_array_equal(data, frames)
+
+    def test_incremental_writer_rejects_wrong_channel_count(self):
+        with IncrementalWavWriter(self.path("mono.wav"), self.sample_rate) as writer:
+            with self.assertRaises(ValueError):
+                writer.write_frames(np.zeros((10, 2), dtype=np.int16))
+
+    def test_read_wav_is_memory_mapped(self):
+        """16-bit PCM input is memory-mapped instead of read into RAM."""
+        input_file = self.path("in.wav")
+        wavfile.write(input_file, self.sample_rate, self.signal.astype(np.int16))
+        sample_rate, data = read_wav(input_file)
+        self.assertEqual(sample_rate, self.sample_rate)
+        self.assertIsInstance(data, np.memmap)
+        np.testing.assert_array_equal(data, self.signal.astype(np.int16))
+        del data
+
+    def test_spectrum_view_is_bounded_by_width(self):
+        """A full-range view returns O(width) points and keeps the spectral peak."""
+        fft_data = fft.fft(np.tile(self.signal, 20))
+        pyramid = SpectrumPyramid(fft_data, self.sample_rate)
+        freqs, mags = pyramid.view(pyramid.f_min, pyramid.f_max, 200)
+        self.assertEqual(len(freqs), len(mags))
+        self.assertGreaterEqual(len(mags), 200)
+        self.assertLess(len(mags), 400)
+        self.assertAlmostEqual(mags.max(), np.abs(fft_data).max(), places=3)
+
+    def test_spectrum_gain_update_matches_rebuild(self):
+        """Updating one band in place gives the same pyramid as rebuilding it."""
+        fft_data = fft.fft(self.signal)
+        sliders = [0, -10, 0, 4, 0, 0, 0, 0, 0]
+        updated = SpectrumPyramid(fft_data, self.sample_rate)
+        updated.set_gains([0] * 9)
+        self.assertEqual(updated.set_gains(sliders), [1, 3])
+
+        rebuilt = SpectrumPyramid(apply_band_gains(fft_data, sliders, self.sample_rate), self.sample_rate)
+        for level_updated, level_rebuilt in zip(updated.levels, rebuilt.levels):
+            np.testing.assert_allclose(level_updated, level_rebuilt)
+
+    def test_benchmark_pipeline_reports_every_stage(self):
+        """The benchmark times every stage and records peak RSS for each."""
+        input_file = self.path("in.wav")
+        generate_wav(input_file, 22050, 0.5, 2)
+        sample_rate, data = wavfile.read(input_file)
+        self.assertEqual((sample_rate, data.shape), (22050, (11025, 2)))
+
+        stages = run_pipeline(input_file, self.path("out.wav"))
+        self.assertEqual(list(stages), STAGES)
+        for stage in stages.values():
+            self.assertGreaterEqual(stage["seconds"], 0)
+            self.assertGreater(stage["peak_rss_bytes"], 0)
+            self.assertIn(stage["peak_rss_scope"], ("stage", "process"))
+
+    def test_killed_child_is_reported(self):
+        """A child that dies without reporting (as after SIGKILL) gives an error record instead of a hang."""
+        results = multiprocessing.Queue()
+        process = multiprocessing.Process(target=os._exit, args=(9,))
+        process.start()
+        self.assertEqual(_wait_for_result(process, results, poll_seconds=0.1), {"error": "exit code 9"})
+
+    def test_peak_rss_reset_gives_stage_peak(self):
+        """After a reset the peak no longer includes an earlier, larger allocation."""
+        if not _reset_peak_rss():
+            self.skipTest("RSS high-water mark cannot be reset on this platform")
+        big = np.ones(50_000_000)
+        del big
+        before_reset = _peak_rss_bytes()
+        self.assertTrue(_reset_peak_rss())
+        self.assertLess(_peak_rss_bytes(), before_reset - 200_000_000)
+
+
+if __name__ == '__main__':
+    unittest.main()
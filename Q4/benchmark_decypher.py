@@ -0,0 +1,145 @@
+"""
+Benchmark suite for the decypher pipeline.
+
+Measures the pieces that dominate a run so optimisations can be tracked:
+QuadgramScorer.score on a fixed sample, quadgram model load time (parsing
+the text file and loading the binary cache), the annealing iteration rate
+of auto_refine_mapping, and end-to-end time to solution on the bundled
+Source-2 ciphertext for each solver. A solution counts as correct when its
+decryption matches the reference plaintext.
+
+Usage:
+    python benchmark_decypher.py
+    python benchmark_decypher.py --repeat 10 --solvers anneal staged --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+
+import numpy as np
+
+from decypher import (ENGLISH_FREQ_ORDER, QuadgramScorer, apply_mapping, auto_refine_mapping, create_initial_mapping,
+                      get_letter_frequencies, load_file, solve_cascade, solve_parallel, solve_staged)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+QUADGRAM_FILE = os.path.join(HERE, 'english_quadgrams.txt')
+CIPHERTEXT_FILE = os.path.join(HERE, 'Source-2-encrypted.txt')
+REFERENCE_FILE = os.path.join(HERE, 'Source-2-plaintext.txt')
+
+SOLVERS = ["cascade", "anneal", "staged", "parallel"]
+SCORE_SAMPLE = 8000
+
+
+def _best_of(func, repeat, number=1):
+    """Best per-call time over `repeat` rounds of `number` calls."""
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def bench_score(scorer, text, repeat=5):
+    sample = text[:SCORE_SAMPLE]
+    number = 100
+    return {"characters": len(sample), "seconds_per_call": _best_of(lambda: scorer.score(sample), repeat, number)}
+
+
+def bench_model_load(repeat=5):
+    """Parse the quadgram text file, then load the binary cache built from it (in a scratch copy)."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, os.path.basename(QUADGRAM_FILE))
+        shutil.copyfile(QUADGRAM_FILE, path)
+        parse = _best_of(lambda: QuadgramScorer(path, cache=False), repeat)
+        QuadgramScorer(path)  # builds the cache
+        cached = _best_of(lambda: QuadgramScorer(path), repeat)
+    return {"parse_seconds": parse, "cached_seconds": cached}
+
+
+def bench_annealing(scorer, text, iterations=2000, seed=0):
+    """Iteration rate of auto_refine_mapping run for a fixed number of iterations."""
+    random.seed(seed)
+    mapping = create_initial_mapping(get_letter_frequencies(text), ENGLISH_FREQ_ORDER)
+    stats = {}
+    auto_refine_mapping(text, mapping, scorer, max_iterations=iterations, early_stop=iterations + 1, stats=stats)
+    return stats
+
+
+def solve(solver, text, scorer, seed=0):
+    """Run one solver from the ciphertext and return its mapping."""
+    if solver == "cascade":
+        random.seed(seed)
+        return solve_cascade(text, scorer)[0]
+    if solver == "anneal":
+        random.seed(seed)
+        mapping = create_initial_mapping(get_letter_frequencies(text), ENGLISH_FREQ_ORDER)
+        return auto_refine_mapping(text, mapping, scorer)
+    if solver == "staged":
+        return solve_staged(text, scorer, seed=seed)[0]
+    if solver == "parallel":
+        return solve_parallel(text, QUADGRAM_FILE, seed=seed)[0]
+    raise ValueError(f"Unknown solver: {solver}")
+
+
+def bench_end_to_end(solver, reference=None, seed=0):
+    """Time from loading the ciphertext and model to a decrypted text."""
+    start = time.perf_counter()
+    text = load_file(CIPHERTEXT_FILE)
+    scorer = QuadgramScorer(QUADGRAM_FILE)
+    mapping = solve(solver, text, scorer, seed)
+    plaintext = apply_mapping(text, mapping)
+    record = {"solver": solver, "seed": seed, "seconds": time.perf_counter() - start}
+    if reference is not None:
+        record["solved"] = plaintext == reference
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the decypher pipeline.")
+    parser.add_argument("--repeat", type=int, default=5, help="Rounds for the micro-benchmarks (best is kept)")
+    parser.add_argument("--iterations", type=int, default=2000, help="Annealing iterations for the rate benchmark")
+    parser.add_argument("--solvers", nargs="+", default=SOLVERS, choices=SOLVERS)
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    parser.add_argument("--output", default=None, help="Write JSON results to this file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    text = load_file(CIPHERTEXT_FILE)
+    scorer = QuadgramScorer(QUADGRAM_FILE)
+    reference = None
+    if os.path.exists(REFERENCE_FILE):
+        with open(REFERENCE_FILE, encoding="utf-8") as f:
+            reference = f.read()
+
+    results = {}
+    print("[*] score", file=sys.stderr)
+    results["score"] = bench_score(scorer, text, args.repeat)
+    print("[*] model_load", file=sys.stderr)
+    results["model_load"] = bench_model_load(args.repeat)
+    print("[*] annealing", file=sys.stderr)
+    results["annealing"] = bench_annealing(scorer, text, args.iterations)
+    results["end_to_end"] = []
+    for solver in args.solvers:
+        for seed in args.seeds:
+            record = bench_end_to_end(solver, reference, seed)
+            results["end_to_end"].append(record)
+            print(f"[*] {solver} (seed {seed}): {record['seconds']:.3f} s", file=sys.stderr)
+
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,209 @@
+import abc
+import argparse
+import codecs
+import contextlib
+import cProfile
+import hashlib
+import io
+import json
+import os
+import pstats
 import string
-from collections import Counter
+import struct
+from collections import Counter, OrderedDict, deque
 import textwrap
 import math
+import multiprocessing
 import random
 import time
 import re
+import numpy as np
 
 ENGLISH_FREQ_ORDER = "etaoinshrdlucmfwygpbvkxqjz"
 COMMON_WORDS = ["the", "and", "you", "that", "was", "for", "are", "with", "his", "they", "this", "have", 
                 "not", "but", "what", "all", "when", "there", "can", "more", "your", "from", "will"]
+_COMMON_WORD_SET = frozenset(COMMON_WORDS)
+# Same word boundaries as \b...\b
+_WORD_RE = re.compile(r'\w+')
 
 
 # --------------------------
 # Quadgram Scorer
 # --------------------------
 class QuadgramScorer:
-    def __init__(self, quadgram_file):
-        self.quadgrams = {}
+    """
+    Quadgram log-probabilities held in a dense 26^4 float32 table.
+
+    A quadgram "ABCD" lives at index a*17576 + b*676 + c*26 + d, so scoring a
+    text is one vectorized gather-and-sum over its encoded letters.
+
+    With cache=True the table is compiled once into a binary file next to the
+    source (see cache_path) and memory-mapped on later runs, so start-up is
+    near-instant and forked workers share the same pages. The cache records a
+    SHA-256 of the source and is rebuilt automatically when that changes.
+    """
+    SIZE = 26 ** 4
+    # magic, format version, floor, total count, SHA-256 of the source file
+    CACHE_HEADER = struct.Struct('<4sIdq32s')
+    CACHE_MAGIC = b'QGRM'
+    CACHE_VERSION = 1
+    CACHE_OFFSET = 64  # table starts on a 64-byte boundary
+
+    def __init__(self, quadgram_file, cache=True):
         self.total = 0
-        self.load_quadgrams(quadgram_file)
-        self.floor = math.log10(0.01 / self.total)
+        self._ngram_tables = {}  # lower-order tables, built on demand by ngram_table
+        if cache:
+            self.load_cached(quadgram_file)
+        else:
+            self.load_quadgrams(quadgram_file)
+
+    @staticmethod
+    def cache_path(path):
+        return os.path.splitext(path)[0] + '.bin'
+
+    def load_cached(self, path):
+        """Memory-map the compiled table, (re)building it if missing or stale."""
+        digest = file_sha256(path)
+        cache = self.cache_path(path)
+        if self._read_cache(cache, digest):
+            return
+
+        self.load_quadgrams(path)
+        try:
+            self._write_cache(cache, digest)
+        except OSError:
+            return  # read-only location: keep the in-memory table
+        self._read_cache(cache, digest)
+
+    def _read_cache(self, cache, digest):
+        try:
+            with open(cache, 'rb') as f:
+                header = f.read(self.CACHE_HEADER.size)
+            size = os.path.getsize(cache)
+        except OSError:
+            return False
+        if len(header) != self.CACHE_HEADER.size or size != self.CACHE_OFFSET + self.SIZE * 4:
+            return False
+
+        magic, version, floor, total, source_digest = self.CACHE_HEADER.unpack(header)
+        if magic != self.CACHE_MAGIC or version != self.CACHE_VERSION or source_digest != digest:
+            return False
+
+        self.floor = floor
+        self.total = total
+        self.table = np.memmap(cache, dtype='<f4', mode='r', offset=self.CACHE_OFFSET, shape=(self.SIZE,))
+        return True
+
+    def _write_cache(self, cache, digest):
+        # Write to a temporary name and rename, so readers never see a partial file
+        tmp = f"{cache}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                header = self.CACHE_HEADER.pack(self.CACHE_MAGIC, self.CACHE_VERSION,
+                                                self.floor, self.total, digest)
+                f.write(header.ljust(self.CACHE_OFFSET, b'\0'))
+                f.write(self.table.astype('<f4').tobytes())
+            os.replace(tmp, cache)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
 
     def load_quadgrams(self, path):
         with open(path, 'r') as f:
-            for line in f:
-                key, count = line.strip().split()
-                self.quadgrams[key] = int(count)
-                self.total += int(count)
+            fields = f.read().split()
+        keys = np.frombuffer(''.join(fields[0::2]).upper().encode('ascii'), dtype=np.uint8)
+        counts = np.array(fields[1::2], dtype=np.int64)
 
-        # Precompute log probabilities
-        self.quadgrams = {k: math.log10(v / self.total) for k, v in self.quadgrams.items()}
+        # Sum counts per quadgram index (in case the file repeats a key)
+        index = quadgram_indices(keys.reshape(-1, 4) - 65)
+        dense = np.bincount(index, weights=counts, minlength=self.SIZE)
+        self.total = int(counts.sum())
+        self.floor = math.log10(0.01 / self.total)
+
+        # Precompute log probabilities, unseen quadgrams get the floor value
+        self.table = np.full(self.SIZE, self.floor, dtype=np.float32)
+        seen = dense > 0
+        self.table[seen] = np.log10(dense[seen] / self.total)
+
+    @staticmethod
+    def encode(text):
+        """Return the letters of text as a uint8 array of 0..25 (everything else dropped)."""
+        data = np.frombuffer(text.upper().encode('utf-8'), dtype=np.uint8)
+        return data[(data >= 65) & (data <= 90)] - 65
+
+    def score_letters(self, letters):
+        """Score an encoded letter array (see encode)."""
+        if len(letters) < 4:
+            return 0.0
+        return float(self.table[quadgram_indices(letters)].sum(dtype=np.float64))
 
     def score(self, text):
-        # Only convert to uppercase once
-        text = ''.join([c for c in text.upper() if c in string.ascii_uppercase])
-        score = 0
-        
-        # Avoid repeatedly slicing the string in the loop
-        text_len = len(text)
-        for i in range(text_len - 3):
-            quad = text[i:i + 4]
-            score += self.quadgrams.get(quad, self.floor)
-        return score
+        return self.score_letters(self.encode(text))
+
+    def ngram_table(self, n):
+        """
+        log10 probabilities of n-grams (n = 1..4) as a flat 26^n float64 table.
+
+        Lower orders are derived from the same corpus by summing the quadgram
+        counts over the trailing letters; unseen n-grams get the floor value.
+        """
+        tables = self._ngram_tables
+        if n not in tables:
+            # Unseen quadgrams hold exactly the float32-rounded floor; every seen one is above it
+            seen = np.asarray(self.table) != np.float32(self.floor)
+            counts = np.where(seen, 10.0 ** np.asarray(self.table, dtype=np.float64), 0.0)
+            counts = counts.reshape((26 ** n, -1)).sum(axis=1)
+            table = np.full(26 ** n, self.floor)
+            seen = counts > 0
+            table[seen] = np.log10(counts[seen] / counts.sum())
+            tables[n] = table
+        return tables[n]
+
+    def score_rows(self, rows):
+        """
+        Score every row of a 2-D uint8 array of ASCII text at once.
+
+        Each row is scored like score() on its decoded text: letters are
+        case-folded and everything else is dropped before taking quadgrams.
+        Returns (scores, quadgram counts) per row.
+        """
+        rows = np.asarray(rows, dtype=np.uint8)
+        if rows.shape[1] < 4:
+            return np.zeros(len(rows)), np.zeros(len(rows), dtype=np.intp)
+        upper = rows & 0xDF  # fold ASCII lowercase to uppercase
+        is_letter = (upper >= 65) & (upper <= 90) & (rows < 128)
+
+        # Move each row's letters to the front (stable, so order is kept)
+        order = np.argsort(~is_letter, axis=1, kind='stable')
+        letters = np.where(np.take_along_axis(is_letter, order, axis=1),
+                           np.take_along_axis(upper, order, axis=1).astype(np.intp) - 65, 0)
+        quadgrams = np.maximum(is_letter.sum(axis=1) - 3, 0)
+
+        index = (letters[:, :-3] * 17576 + letters[:, 1:-2] * 676 + letters[:, 2:-1] * 26 + letters[:, 3:])
+        valid = np.arange(index.shape[1]) < quadgrams[:, None]
+        scores = np.where(valid, self.table[index], 0).sum(axis=1, dtype=np.float64)
+        return scores, quadgrams
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.digest()
+
+
+def quadgram_indices(letters):
+    """
+    Table indices of the quadgrams in letters.
+
+    letters is either a 1-D array of 0..25 values (every overlapping quadgram)
+    or an (n, 4) array (one quadgram per row).
+    """
+    letters = np.asarray(letters, dtype=np.intp)
+    if letters.ndim == 2:
+        return letters[:, 0] * 17576 + letters[:, 1] * 676 + letters[:, 2] * 26 + letters[:, 3]
+    return letters[:-3] * 17576 + letters[1:-2] * 676 + letters[2:-1] * 26 + letters[3:]
 
 
 # --------------------------
@@ -65,16 +227,50 @@ def create_initial_mapping(cipher_freq, target_freq):
     return mapping
 
 
+def mapping_table(mapping):
+    """
+    str.translate table for apply_mapping: mapped characters are replaced,
+    unmapped uppercase letters use the mapping of their lowercase form
+    (or '?'), everything else is kept.
+    """
+    table = {ord(c): mapping.get(c.lower(), '?').upper() for c in string.ascii_uppercase}
+    table.update((ord(k), v) for k, v in mapping.items())
+    return table
+
+
 def apply_mapping(text, mapping):
-    result = []
-    for char in text:
-        if char in mapping:
-            result.append(mapping[char])
-        elif char in string.ascii_uppercase:
-            result.append(mapping.get(char.lower(), '?').upper())
-        else:
-            result.append(char)
-    return ''.join(result)
+    return text.translate(mapping_table(mapping))
+
+
+def decrypt_file(src_path, dst_path, mapping, chunk_size=1 << 20):
+    """
+    Decrypt a file as apply_mapping(load_file(src_path), mapping), streaming in constant memory.
+
+    Pure-ASCII chunks without a carriage return go through a 256-byte
+    bytes.translate table that also folds case; other chunks are decoded
+    incrementally as UTF-8 with the same newline translation as load_file,
+    lowercased and translated with mapping_table.
+    """
+    table = mapping_table(mapping)
+    byte_table = bytearray(range(256))
+    for b in range(128):
+        char = chr(b).lower()
+        out = table.get(ord(char), char)
+        if len(out) != 1 or not out.isascii():
+            byte_table = None  # mapping produces non-ASCII output: always use the text path
+            break
+        byte_table[b] = ord(out)
+
+    decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder('utf-8')(), translate=True)
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        for chunk in iter(lambda: src.read(chunk_size), b''):
+            # The fast path needs no half-decoded character or pending '\r' from the previous chunk
+            if (byte_table is not None and chunk.isascii() and b'\r' not in chunk
+                    and decoder.getstate() == (b'', 0)):
+                dst.write(chunk.translate(byte_table))
+            else:
+                dst.write(decoder.decode(chunk).lower().translate(table).encode('utf-8'))
+        dst.write(decoder.decode(b'', final=True).lower().translate(table).encode('utf-8'))
 
 
 def print_mapping(mapping):
@@ -84,66 +280,338 @@ def print_mapping(mapping):
     print("\n")
 
 
+def load_bytes(path):
+    """Memory-map a file as a read-only uint8 array."""
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=np.uint8)  # empty files cannot be mapped
+    return np.memmap(path, dtype=np.uint8, mode='r')
+
+
+def as_uint8(data):
+    """View bytes, bytearrays or arrays (including memmaps) as a uint8 array without copying."""
+    if isinstance(data, np.ndarray):
+        return data.view(np.uint8).reshape(-1)
+    return np.frombuffer(data, dtype=np.uint8)
+
+
 def xor_bytes(b1, b2):
-    """Return the XOR of two byte sequences (shorter one determines length)."""
-    return bytes(a ^ b for a, b in zip(b1, b2))
+    """Return the XOR of two byte sequences as a uint8 array (shorter one determines length)."""
+    a1, a2 = as_uint8(b1), as_uint8(b2)
+    length = min(len(a1), len(a2))
+    return np.bitwise_xor(a1[:length], a2[:length])
 
 
-def find_matching_segments(xor_data, min_length=4):
-    """Find all continuous zero-byte sequences of at least min_length."""
+def find_matching_segments(xor_data, min_length=4, block_size=1 << 24):
+    """
+    Find all continuous zero-byte sequences of at least min_length.
+
+    Runs are located with a diff over the zero mask, one block at a time so a
+    memory-mapped input never needs more than block_size bytes of mask.
+    Returns a list of (start, length) tuples.
+    """
+    data = as_uint8(xor_data)
     matches = []
-    current_start = None
+    open_start = None  # start of a run still open at the previous block's end
 
-    for i, byte in enumerate(xor_data):
-        if byte == 0:
-            if current_start is None:
-                current_start = i
-        else:
-            if current_start is not None:
-                length = i - current_start
-                if length >= min_length:
-                    matches.append((current_start, length))
-                current_start = None
+    for offset in range(0, len(data), block_size):
+        zero = np.concatenate(([False], data[offset:offset + block_size] == 0, [False]))
+        edges = np.flatnonzero(zero[1:] != zero[:-1]) + offset
+        starts, ends = edges[0::2], edges[1::2]
+        block_end = offset + len(zero) - 2
 
-    if current_start is not None:
-        length = len(xor_data) - current_start
-        if length >= min_length:
-            matches.append((current_start, length))
+        if open_start is not None:
+            if len(starts) and starts[0] == offset:
+                starts[0] = open_start
+            elif open_start <= offset - min_length:
+                matches.append((int(open_start), int(offset - open_start)))
+            open_start = None
+        if len(ends) and ends[-1] == block_end and block_end < len(data):
+            open_start = starts[-1]
+            starts, ends = starts[:-1], ends[:-1]
+
+        lengths = ends - starts
+        keep = lengths >= min_length
+        matches.extend(zip(starts[keep].tolist(), lengths[keep].tolist()))
 
     return matches
 
 
+def crib_drag(xor_stream, crib, scorer, top=10, block_size=1 << 16):
+    """
+    Slide a crib across every offset of a two-time-pad XOR stream at once.
+
+    xor_stream is c1 ^ c2 = p1 ^ p2, so wherever crib appears in one
+    plaintext, the window XOR crib is the other plaintext at that offset. All
+    windows of a block are XORed in one operation; candidates with
+    non-printable bytes are dropped and the rest ranked by quadgram score per
+    quadgram (see QuadgramScorer.score_rows).
+
+    Returns up to `top` (offset, score, text) tuples, best first.
+    """
+    data = as_uint8(xor_stream)
+    crib = as_uint8(crib.encode('ascii') if isinstance(crib, str) else crib)
+    offsets = len(data) - len(crib) + 1
+    best = []
+
+    for start in range(0, max(0, offsets), block_size):
+        block = data[start:start + block_size + len(crib) - 1]
+        windows = np.lib.stride_tricks.sliding_window_view(block, len(crib)) ^ crib
+        printable = ((windows >= 32) & (windows < 127)) | (windows == 9) | (windows == 10) | (windows == 13)
+        rows = np.flatnonzero(printable.all(axis=1))
+        if len(rows) == 0:
+            continue
+
+        scores, quadgrams = scorer.score_rows(windows[rows])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            per_quadgram = np.where(quadgrams > 0, scores / quadgrams, -np.inf)
+        keep = np.argsort(-per_quadgram, kind='stable')[:top]
+        best.extend((int(start + rows[i]), float(per_quadgram[i]), windows[rows[i]].tobytes().decode('ascii'))
+                    for i in keep)
+
+    best.sort(key=lambda candidate: (-candidate[1], candidate[0]))
+    return best[:top]
+
+
+def translate_table(mapping):
+    """
+    str.translate table for translate_text: characters whose uppercase form
+    is a key of mapping are replaced, in their own case (ASCII case pairs).
+    """
+    table = {}
+    for k, v in mapping.items():
+        for char in {k, k.lower()}:
+            if char.upper() == k:
+                table[ord(char)] = v if char.isupper() else v.lower()
+    return table
+
+
 def translate_text(text, mapping):
     """Translate a string using a monoalphabetic mapping (preserving case)."""
-    result = ""
-    for char in text:
-        upper_char = char.upper()
-        if upper_char in mapping:
-            if char.isupper():
-                result += mapping[upper_char]
-            else:
-                result += mapping[upper_char].lower()
-        else:
-            result += char
-    return result
+    return text.translate(translate_table(mapping))
 
 
 def count_common_words(text):
-    """Count occurrences of common English words in text"""
-    text = text.lower()
-    word_count = 0
-    for word in COMMON_WORDS:
-        # Use word boundary to match whole words only
-        pattern = r'\b' + re.escape(word) + r'\b'
-        word_count += len(re.findall(pattern, text))
-    return word_count
+    """Count occurrences of common English words in text (whole words only)"""
+    return sum(1 for word in _WORD_RE.findall(text.lower()) if word in _COMMON_WORD_SET)
+
+
+# --------------------------
+# Incremental Scoring of Letter Swaps
+# --------------------------
+class IncrementalScore(abc.ABC):
+    """
+    Running score of ciphertext samples under a changing mapping.
+
+    The score is a sum over "units" (quadgrams, words, ...), each a row of
+    cipher letter indices (26 pads short rows). For every cipher letter the
+    rows it occurs in are indexed once, so swapping two plaintext letters only
+    rescores the rows containing the cipher letters that map to them:
+    O(occurrences of two letters), not O(samples). Subclasses pass their
+    units to __init__ and implement _unit_values().
+    """
+
+    def __init__(self, units, mapping):
+        self.units = units
+        # Row c: which units contain cipher letter c
+        self.contains = np.stack([(units == c).any(axis=1) for c in range(26)])
+        self._affected = {}
+
+        self.mapping = dict(mapping)
+        # Plaintext letter index per cipher letter (unmapped letters decrypt to themselves)
+        self.perm = np.arange(27)
+        for k, v in self.mapping.items():
+            if k in string.ascii_lowercase and v in string.ascii_lowercase:
+                self.perm[ord(k) - 97] = ord(v) - 97
+        # Current value of every unit, so a trial only computes the new values
+        self.values = self._values(self.perm, np.arange(len(units)))
+        self.score = float(self.values.sum(dtype=np.float64))
+        self._pending = None
+        self.evaluations = 0
+
+    @abc.abstractmethod
+    def _unit_values(self, plain_units, rows):
+        """Values of the given rows, whose letters are already decrypted to plain_units."""
+
+    def _values(self, perm, rows):
+        if len(rows) == 0:
+            return np.zeros(0)
+        return self._unit_values(perm[self.units[rows]], rows)
+
+    def _swap(self, a, b):
+        """Cipher letters whose plaintext changes when plaintext letters a and b swap."""
+        return {k: (b if v == a else a) for k, v in self.mapping.items()
+                if v in (a, b) and k in string.ascii_lowercase}
+
+    def _rows(self, cipher_letters):
+        key = tuple(sorted(cipher_letters))
+        rows = self._affected.get(key)
+        if rows is None:
+            rows = np.flatnonzero(self.contains[[ord(k) - 97 for k in key]].any(axis=0))
+            self._affected[key] = rows
+        return rows
+
+    def swap_delta(self, a, b):
+        """Score change if plaintext letters a and b were swapped in the mapping."""
+        self.evaluations += 1
+        changed = self._swap(a, b)
+        rows = self._rows(changed)
+        trial = self.perm.copy()
+        for k, v in changed.items():
+            trial[ord(k) - 97] = ord(v) - 97
+        values = self._values(trial, rows)
+        self._pending = (a, b, rows, values)
+        return float(values.sum(dtype=np.float64) - self.values[rows].sum(dtype=np.float64))
+
+    def apply_swap(self, a, b, delta):
+        """Commit a swap whose delta came from swap_delta."""
+        changed = self._swap(a, b)
+        for k, v in changed.items():
+            self.mapping[k] = v
+            self.perm[ord(k) - 97] = ord(v) - 97
+
+        if self._pending is not None and self._pending[:2] == (a, b):
+            rows, values = self._pending[2:]
+        else:
+            rows = self._rows(changed)
+            values = self._values(self.perm, rows)
+        self.values[rows] = values
+        self.score += delta
+        self._pending = None
+
+
+class IncrementalQuadgramScore(IncrementalScore):
+    """Quadgram score of the samples (as QuadgramScorer.score) kept up to date across swaps."""
+
+    def __init__(self, samples, mapping, scorer):
+        # Plain ndarray view of the (possibly memory-mapped) table, avoids memmap indexing overhead
+        self.table = np.asarray(scorer.table)
+        quads = []
+        for sample in samples:
+            letters = QuadgramScorer.encode(sample.lower())
+            if len(letters) >= 4:
+                quads.append(np.lib.stride_tricks.sliding_window_view(letters, 4))
+        super().__init__(np.concatenate(quads) if quads else np.zeros((0, 4), dtype=np.uint8), mapping)
+
+    def _unit_values(self, plain_units, rows):
+        return self.table[quadgram_indices(plain_units)]
+
+
+class IncrementalWordScore(IncrementalScore):
+    """
+    Common-word bonus of the samples (as count_common_words * weight) kept up to date across swaps.
+
+    Each distinct cipher word that could decrypt to a common word is stored
+    once with its count; decrypted words are compared as base-27 integers
+    against the sorted codes of COMMON_WORDS.
+    """
+    WORD_LENGTH = max(len(word) for word in COMMON_WORDS)
+    POWERS = 27 ** np.arange(WORD_LENGTH)
+
+    def __init__(self, samples, mapping, weight=5):
+        self.weight = weight
+        lengths = {len(word) for word in COMMON_WORDS}
+        words = Counter()
+        for sample in samples:
+            for word in _WORD_RE.findall(sample.lower()):
+                if len(word) in lengths and all(c in string.ascii_lowercase for c in word):
+                    words[word] += 1
+        self.counts = np.array(list(words.values()), dtype=np.float64)
+        self.common = np.sort(self.encode_words(COMMON_WORDS))
+        super().__init__(self.encode_words(words, as_indices=True), mapping)
+
+    @classmethod
+    def encode_words(cls, words, as_indices=False):
+        """Letter-index rows (padded with 26) of words, or their base-27 codes."""
+        rows = np.full((len(words), cls.WORD_LENGTH), 26, dtype=np.uint8)
+        for i, word in enumerate(words):
+            rows[i, :len(word)] = [ord(c) - 97 for c in word]
+        return rows if as_indices else rows.astype(np.int64) @ cls.POWERS
+
+    def _unit_values(self, plain_units, rows):
+        codes = plain_units.astype(np.int64) @ self.POWERS
+        found = self.common[np.minimum(np.searchsorted(self.common, codes), len(self.common) - 1)] == codes
+        return found * self.counts[rows] * self.weight
+
+
+def swap_mapping(mapping, a, b):
+    """Return a copy of mapping with plaintext letters a and b exchanged."""
+    trial_mapping = mapping.copy()
+    for k, v in trial_mapping.items():
+        if v == a:
+            trial_mapping[k] = b
+        elif v == b:
+            trial_mapping[k] = a
+    return trial_mapping
+
+
+def select_samples(text, sample_size):
+    """Pick scoring samples: beginning, middle and end of long texts, else the text itself."""
+    samples = []
+    text_len = len(text)
+    if text_len > sample_size * 3:
+        # Take samples from beginning, middle and end
+        samples.append(text[:sample_size])
+        samples.append(text[text_len//2 - sample_size//2:text_len//2 + sample_size//2])
+        samples.append(text[text_len-sample_size:])
+    else:
+        # Use whole text if short enough
+        samples.append(text[:sample_size] if text_len > sample_size else text)
+    return samples
 
 
 # --------------------------
 # Auto Refinement Using Quadgram Scoring with Simulated Annealing
 # --------------------------
+class ScoreCache:
+    """
+    Bounded LRU of scores keyed by mapping fingerprint.
+
+    A fingerprint is the 26-byte permutation (plaintext index per cipher
+    letter); the state after swapping plaintext letters a and b is found with
+    bytes.translate, so a lookup never touches the text.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(mapping):
+        return bytes(mapping_to_perm(mapping).tolist())
+
+    @staticmethod
+    def swapped(fingerprint, a, b):
+        """Fingerprint after swapping plaintext letters a and b."""
+        a, b = ord(a) - 97, ord(b) - 97
+        return fingerprint.translate(bytes.maketrans(bytes([a, b]), bytes([b, a])))
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
 def auto_refine_mapping(text, initial_mapping, scorer, max_iterations=2000, sample_size=8000, early_stop=150, 
-                        initial_temp=10.0, cooling_rate=0.99):
+                        initial_temp=10.0, cooling_rate=0.99, cache=None, tabu_size=0, verbose=False, stats=None):
     """
     Refine the mapping using simulated annealing with quadgram scoring
     
@@ -156,31 +624,33 @@ def auto_refine_mapping(text, initial_mapping, scorer, max_iterations=2000, samp
         early_stop: Stop after this many iterations without improvement
         initial_temp: Starting temperature for simulated annealing
         cooling_rate: Rate at which temperature decreases
+        cache: ScoreCache of visited mappings (default: a new one with 4096 entries)
+        tabu_size: Do not retry any of this many most recently rejected swaps until a swap is
+            accepted (capped at 324, so some swap is always allowed)
+        verbose: Print progress while annealing
+        stats: Optional dict filled with iteration counts, rates, scorer calls and cache statistics
     """
-    print(f"[*] Starting refinement with {max_iterations} max iterations, {sample_size} sample size")
-    print(f"[*] Using simulated annealing (temp: {initial_temp}, cooling: {cooling_rate})")
+    if verbose:
+        print(f"[*] Starting refinement with {max_iterations} max iterations, {sample_size} sample size")
+        print(f"[*] Using simulated annealing (temp: {initial_temp}, cooling: {cooling_rate})")
     
     # Use several different samples from the text for better coverage
-    samples = []
-    text_len = len(text)
-    if text_len > sample_size * 3:
-        # Take samples from beginning, middle and end
-        samples.append(text[:sample_size])
-        samples.append(text[text_len//2 - sample_size//2:text_len//2 + sample_size//2])
-        samples.append(text[text_len-sample_size:])
-    else:
-        # Use whole text if short enough
-        samples.append(text[:sample_size] if text_len > sample_size else text)
-    
+    samples = select_samples(text, sample_size)
+
     best_mapping = initial_mapping.copy()
-    
-    # Score each sample and sum them up
-    best_score = 0
-    for sample in samples:
-        decryption = apply_mapping(sample, best_mapping)
-        best_score += scorer.score(decryption)
-        # Add bonus for common words detected
-        best_score += count_common_words(decryption) * 5
+
+    # Quadgram score plus a bonus for common words, both updated incrementally per swap
+    quadgrams = IncrementalQuadgramScore(samples, best_mapping, scorer)
+    words = IncrementalWordScore(samples, best_mapping, weight=5)
+    best_score = quadgrams.score + words.score
+
+    # Scores of mappings already visited, so a repeated trial costs a dictionary lookup
+    if cache is None:
+        cache = ScoreCache()
+    state = ScoreCache.fingerprint(best_mapping)
+    cache.put(state, (quadgrams.score, words.score))
+    # Swaps already rejected from the current mapping
+    tabu = deque(maxlen=min(tabu_size, 324))
     
     # Keep track of progress
     iterations_without_improvement = 0
@@ -191,41 +661,45 @@ def auto_refine_mapping(text, initial_mapping, scorer, max_iterations=2000, samp
     max_temp_resets = 3
 
     for iteration in range(max_iterations):
-        trial_mapping = best_mapping.copy()
-
         # Swap two random letters
         a, b = random.sample(string.ascii_lowercase, 2)
-        for k, v in trial_mapping.items():
-            if v == a:
-                trial_mapping[k] = b
-            elif v == b:
-                trial_mapping[k] = a
-
-        # Score all samples and sum up
-        trial_score = 0
-        for sample in samples:
-            decryption = apply_mapping(sample, trial_mapping)
-            trial_score += scorer.score(decryption)
-            # Add bonus for common words detected
-            trial_score += count_common_words(decryption) * 5
+        while tabu and {a, b} in tabu:
+            a, b = random.sample(string.ascii_lowercase, 2)
+
+        candidate = ScoreCache.swapped(state, a, b)
+        known = cache.get(candidate)
+        if known is not None:
+            quad_delta = known[0] - quadgrams.score
+            word_delta = known[1] - words.score
+        else:
+            # Only the quadgrams and words containing the swapped letters are rescored
+            quad_delta = quadgrams.swap_delta(a, b)
+            word_delta = words.swap_delta(a, b)
+            cache.put(candidate, (quadgrams.score + quad_delta, words.score + word_delta))
 
         # Delta between new and old scores
-        score_delta = trial_score - best_score
+        score_delta = quad_delta + word_delta
 
         # Accept if better score, or with probability based on temperature
         if score_delta > 0 or random.random() < math.exp(score_delta / temperature):
-            best_score = trial_score
-            best_mapping = trial_mapping
+            quadgrams.apply_swap(a, b, quad_delta)
+            words.apply_swap(a, b, word_delta)
+            best_score = quadgrams.score + words.score
+            best_mapping = swap_mapping(best_mapping, a, b)
+            state = candidate
+            tabu.clear()
             
             # Track improvements
             if score_delta > 0:
                 improvement_count += 1
                 iterations_without_improvement = 0
-                if improvement_count % 20 == 0:
+                if verbose and improvement_count % 20 == 0:
                     print(f"[+] Iteration {iteration}: Improved score: {best_score:.2f}, temp: {temperature:.4f}")
             
         else:
             iterations_without_improvement += 1
+            if tabu.maxlen:
+                tabu.append({a, b})
             
         # Cool down the temperature
         temperature *= cooling_rate
@@ -234,28 +708,414 @@ def auto_refine_mapping(text, initial_mapping, scorer, max_iterations=2000, samp
         if iterations_without_improvement >= early_stop:
             # If we're less than halfway through, try resetting temperature to escape local minimum
             if iteration < max_iterations // 2 and temp_resets < max_temp_resets:
-                print(f"[*] Resetting temperature to escape local minimum (reset {temp_resets+1}/{max_temp_resets})")
+                if verbose:
+                    print(f"[*] Resetting temperature to escape local minimum "
+                          f"(reset {temp_resets+1}/{max_temp_resets})")
                 temperature = initial_temp * (0.7 ** (temp_resets + 1))  # Each reset has slightly lower temperature
                 iterations_without_improvement = 0
                 temp_resets += 1
                 
                 # Show current sample to indicate progress
-                sample_decryption = apply_mapping(text[:200], best_mapping)
-                print(f"[*] Current sample decryption: {sample_decryption}")
+                if verbose:
+                    sample_decryption = apply_mapping(text[:200], best_mapping)
+                    print(f"[*] Current sample decryption: {sample_decryption}")
                 continue
             
-            print(f"[+] Early stopping after {iteration} iterations - no improvement for {early_stop} iterations")
-            sample_decryption = apply_mapping(text[:200], best_mapping)
-            print(f"[*] Final sample decryption: {sample_decryption}")
+            if verbose:
+                print(f"[+] Early stopping after {iteration} iterations - no improvement for {early_stop} iterations")
+                sample_decryption = apply_mapping(text[:200], best_mapping)
+                print(f"[*] Final sample decryption: {sample_decryption}")
             break
 
     elapsed = time.time() - start_time
-    print(f"[+] Refinement completed in {elapsed:.2f} seconds ({iteration+1} iterations)")
-    print(f"[+] Final score: {best_score:.2f} with {improvement_count} improvements")
-    print_mapping(best_mapping)
+    if verbose:
+        print(f"[+] Refinement completed in {elapsed:.2f} seconds ({iteration+1} iterations)")
+        print(f"[+] Final score: {best_score:.2f} with {improvement_count} improvements")
+        print(f"[+] Score cache: {cache.hits}/{cache.hits + cache.misses} hits ({cache.hit_rate:.1%})")
+        print_mapping(best_mapping)
+    if stats is not None:
+        stats.update({
+            "iterations": iteration + 1,
+            "seconds": elapsed,
+            "iterations_per_second": (iteration + 1) / elapsed if elapsed > 0 else 0.0,
+            "score": best_score,
+            "improvements": improvement_count,
+            "temperature_resets": temp_resets,
+            "quadgram_evaluations": quadgrams.evaluations,
+            "word_evaluations": words.evaluations,
+            "cache_hits": cache.hits,
+            "cache_misses": cache.misses,
+            "cache_hit_rate": cache.hit_rate,
+        })
     return best_mapping
 
 
+# --------------------------
+# Staged Solver: Bigram Hill-Climb, then Quadgram Refinement
+# --------------------------
+def bigram_counts(text):
+    """26x26 counts of adjacent letter pairs, over letters only (as the scorer sees them)."""
+    letters = QuadgramScorer.encode(text).astype(np.intp)
+    return np.bincount(letters[:-1] * 26 + letters[1:], minlength=676).reshape(26, 26).astype(np.float64)
+
+
+def mapping_to_perm(mapping):
+    """Full permutation (cipher index -> plaintext index); unmapped letters get the unused plaintext letters."""
+    perm = np.full(26, -1)
+    for k, v in mapping.items():
+        if k in string.ascii_lowercase and v in string.ascii_lowercase:
+            perm[ord(k) - 97] = ord(v) - 97
+    unused = sorted(set(range(26)) - set(perm[perm >= 0].tolist()))
+    perm[perm < 0] = unused[:int((perm < 0).sum())]
+    return perm
+
+
+def perm_to_mapping(perm):
+    return {chr(97 + c): chr(97 + int(p)) for c, p in enumerate(perm)}
+
+
+def bigram_swap_deltas(counts, log_bigrams, perm):
+    """
+    Change in sum(counts[i, j] * log_bigrams[perm[i], perm[j]]) when perm[x]
+    and perm[y] swap, for every pair (x, y) at once, as a 26x26 matrix.
+
+    Only rows and columns x and y of the count matrix are affected by a swap,
+    so the text is never touched: they are rescored for all pairs with two
+    26x26 matrix products, and the four entries where they cross are then
+    corrected exactly.
+    """
+    m = log_bigrams[np.ix_(perm, perm)]
+    rows = counts @ m.T   # rows[i, k]: row i of the counts scored as if i decrypted to perm[k]
+    cols = counts.T @ m   # cols[i, k]: column i likewise
+    rows_d, cols_d = np.diag(rows), np.diag(cols)
+    delta = (rows - rows_d[:, None] + rows.T - rows_d[None, :]
+             + cols - cols_d[:, None] + cols.T - cols_d[None, :])
+
+    c_xx, c_yy, c_xy, c_yx = np.diag(counts)[:, None], np.diag(counts)[None, :], counts, counts.T
+    m_xx, m_yy, m_xy, m_yx = np.diag(m)[:, None], np.diag(m)[None, :], m, m.T
+    # What the row and column terms above credited to the crossing entries...
+    counted = (c_xx * (m_yx - m_xx) + c_xy * (m_yy - m_xy) + c_yx * (m_xx - m_yx) + c_yy * (m_xy - m_yy)
+               + c_xx * (m_xy - m_xx) + c_yx * (m_yy - m_yx) + c_xy * (m_xx - m_xy) + c_yy * (m_yx - m_yy))
+    # ...and their actual change
+    actual = (c_xx * (m_yy - m_xx) + c_xy * (m_yx - m_xy) + c_yx * (m_xy - m_yx) + c_yy * (m_xx - m_yy))
+    delta += actual - counted
+    np.fill_diagonal(delta, 0.0)
+    return delta
+
+
+def bigram_hill_climb(counts, log_bigrams, perm):
+    """
+    Steepest-ascent hill-climb: apply the best of all 325 swaps until none improves.
+
+    Returns (perm, evaluations), counting 325 evaluations per step.
+    """
+    perm = perm.copy()
+    evaluations = 0
+    while True:
+        delta = bigram_swap_deltas(counts, log_bigrams, perm)
+        evaluations += 325
+        x, y = np.unravel_index(np.argmax(delta), delta.shape)
+        if delta[x, y] <= 1e-9:
+            return perm, evaluations
+        perm[x], perm[y] = perm[y], perm[x]
+
+
+def quadgram_hill_climb(quadgrams, words=None):
+    """Apply improving plaintext swaps (quadgram + optional word score) until none is left."""
+    evaluations = 0
+    improved = True
+    letters = string.ascii_lowercase
+    while improved:
+        improved = False
+        for i, a in enumerate(letters):
+            for b in letters[i + 1:]:
+                evaluations += 1
+                quad_delta = quadgrams.swap_delta(a, b)
+                word_delta = words.swap_delta(a, b) if words is not None else 0.0
+                if quad_delta + word_delta > 1e-9:
+                    quadgrams.apply_swap(a, b, quad_delta)
+                    if words is not None:
+                        words.apply_swap(a, b, word_delta)
+                    improved = True
+    return evaluations
+
+
+def solve_staged(text, scorer, sample_size=8000, restarts=5, seed=0):
+    """
+    Break a substitution cipher in two stages.
+
+    Stage 1 hill-climbs on the 26x26 cipher bigram count matrix: all 325
+    swaps are scored together (bigram_swap_deltas) without a pass over the
+    text, and the best one is applied. It starts from the
+    frequency-analysis mapping plus `restarts` random permutations, and the
+    best bigram optimum moves on. Stage 2 refines that mapping with
+    incremental quadgram + common-word scoring until no swap improves it.
+
+    Returns (mapping, stats) where stats counts the evaluations per stage.
+    """
+    rng = random.Random(seed)
+    samples = select_samples(text, sample_size)
+    counts = sum(bigram_counts(sample) for sample in samples)
+    log_bigrams = scorer.ngram_table(2).reshape(26, 26)
+
+    starts = [mapping_to_perm(create_initial_mapping(get_letter_frequencies(text), ENGLISH_FREQ_ORDER))]
+    starts += [np.array(rng.sample(range(26), 26)) for _ in range(restarts)]
+
+    best_perm, best_bigram_score, bigram_evaluations = None, float('-inf'), 0
+    for start in starts:
+        perm, evaluations = bigram_hill_climb(counts, log_bigrams, start)
+        bigram_evaluations += evaluations
+        bigram_score = float((counts * log_bigrams[np.ix_(perm, perm)]).sum())
+        if bigram_score > best_bigram_score:
+            best_perm, best_bigram_score = perm, bigram_score
+
+    mapping = perm_to_mapping(best_perm)
+    quadgrams = IncrementalQuadgramScore(samples, mapping, scorer)
+    words = IncrementalWordScore(samples, mapping, weight=5)
+    quadgram_evaluations = quadgram_hill_climb(quadgrams, words)
+
+    stats = {"bigram_score": best_bigram_score, "bigram_evaluations": bigram_evaluations,
+             "quadgram_evaluations": quadgram_evaluations, "score": quadgrams.score + words.score}
+    return dict(quadgrams.mapping), stats
+
+
+# --------------------------
+# Structured Keys: Shift and Affine Fast Path
+# --------------------------
+# Multipliers a with gcd(a, 26) == 1; a = 1 are the 26 shifts
+AFFINE_MULTIPLIERS = [a for a in range(1, 26) if math.gcd(a, 26) == 1]
+
+
+def affine_keys():
+    """All 312 affine keys (a, b), encryption c = a * p + b mod 26, and their decryption tables (cipher -> plain)."""
+    keys = np.array([(a, b) for a in AFFINE_MULTIPLIERS for b in range(26)])
+    inverses = np.array([pow(int(a), -1, 26) for a in keys[:, 0]])
+    plain_of_cipher = (inverses[:, None] * (np.arange(26)[None, :] - keys[:, 1:])) % 26
+    return keys, plain_of_cipher
+
+
+def affine_mapping(a, b):
+    """Decryption mapping (cipher -> plain) for the affine key (a, b)."""
+    return {chr(97 + (a * p + b) % 26): chr(97 + p) for p in range(26)}
+
+
+def solve_structured(text, scorer, affine=True, confirm=3, sample_size=8000, min_per_quadgram=-4.8):
+    """
+    Look for a shift or affine key in closed form.
+
+    The cipher letter counts are correlated with English unigram frequencies
+    (from the scorer's corpus) under every key at once. The best `confirm`
+    keys are then scored with quadgrams on a sample, and the best one is
+    accepted if it reaches min_per_quadgram (English is about -4.4, the
+    frequency-analysis mapping of a general substitution about -5.3).
+
+    Returns (mapping, stats) with stats["accepted"] telling whether the key fits.
+    """
+    letters = QuadgramScorer.encode(text)
+    counts = np.bincount(letters, minlength=26).astype(np.float64)
+    english = 10 ** scorer.ngram_table(1)
+
+    keys, plain_of_cipher = affine_keys()
+    if not affine:
+        keys, plain_of_cipher = keys[keys[:, 0] == 1], plain_of_cipher[keys[:, 0] == 1]
+
+    # Pearson correlation of the observed counts with the frequency each key predicts
+    expected = english[plain_of_cipher]
+    expected = expected - expected.mean(axis=1, keepdims=True)
+    observed = counts - counts.mean()
+    norms = np.linalg.norm(expected, axis=1) * np.linalg.norm(observed)
+    correlations = expected @ observed / np.where(norms > 0, norms, 1)
+
+    sample = letters[:sample_size]
+    quadgrams = max(1, len(sample) - 3)
+    best = None
+    for k in np.argsort(-correlations)[:confirm]:
+        per_quadgram = scorer.score_letters(plain_of_cipher[k][sample]) / quadgrams
+        if best is None or per_quadgram > best[1]:
+            best = (k, per_quadgram)
+
+    k, per_quadgram = best
+    a, b = (int(x) for x in keys[k])
+    stats = {
+        "kind": "shift" if a == 1 else "affine",
+        "key": [a, b],
+        "correlation": float(correlations[k]),
+        "score_per_quadgram": per_quadgram,
+        "accepted": bool(len(sample) >= 4 and per_quadgram >= min_per_quadgram),
+    }
+    return affine_mapping(a, b), stats
+
+
+def solve_cascade(text, scorer, affine=True, **anneal_args):
+    """
+    Try a shift/affine key first and anneal (auto_refine_mapping) only when none fits.
+
+    anneal_args go to auto_refine_mapping. Returns (mapping, stats), where
+    stats["solver"] is "shift", "affine" or "anneal" and stats["structured"]
+    holds the fast-path result.
+    """
+    mapping, structured = solve_structured(text, scorer, affine=affine)
+    if structured["accepted"]:
+        return mapping, {"solver": structured["kind"], "structured": structured,
+                         "score": scorer.score(apply_mapping(text, mapping))}
+
+    stats = anneal_args.pop("stats", None)
+    if stats is None:
+        stats = {}
+    initial = create_initial_mapping(get_letter_frequencies(text), ENGLISH_FREQ_ORDER)
+    mapping = auto_refine_mapping(text, initial, scorer, stats=stats, **anneal_args)
+    stats.update({"solver": "anneal", "structured": structured})
+    return mapping, stats
+
+
+# --------------------------
+# Parallel Multi-Restart Annealing
+# --------------------------
+_worker_scorer = None
+_worker_samples = None
+_worker_first_hit = None
+_worker_rows = None
+# First-hit value meaning no chain has reached the target yet
+NO_HIT = 1 << 62
+
+
+def _init_worker(quadgram_file, samples, first_hit):
+    # The compiled table is memory-mapped, so all workers share the same pages;
+    # samples are sent once here rather than with every epoch's tasks
+    global _worker_scorer, _worker_samples, _worker_first_hit, _worker_rows
+    _worker_scorer = QuadgramScorer(quadgram_file)
+    _worker_samples = samples
+    _worker_first_hit = first_hit
+    # Affected rows depend only on the samples, so every epoch can reuse them
+    _worker_rows = {}
+
+
+def _record_hit(iterations):
+    with _worker_first_hit.get_lock():
+        _worker_first_hit.value = min(_worker_first_hit.value, iterations)
+
+
+def _anneal_epoch(task):
+    """
+    Run one chain for up to task["iterations"] steps and return its state.
+
+    A chain stops at its own first hit of the target ("hit" is the step it
+    happened on), or once it has run as many steps as the earliest hit any
+    chain has recorded so far: a later hit could not be the earliest one.
+    """
+    rng = random.Random(task["seed"])
+    quadgrams = IncrementalQuadgramScore(_worker_samples, task["mapping"], _worker_scorer)
+    quadgrams._affected = _worker_rows
+    temperature = task["temperature"]
+    best_mapping, best_score = dict(quadgrams.mapping), quadgrams.score
+
+    iterations = 0
+    hit = None
+    if best_score >= task["target"]:
+        hit = 0
+        _record_hit(hit)
+
+    while hit is None and iterations < min(task["iterations"], _worker_first_hit.value):
+        iterations += 1
+        a, b = rng.sample(string.ascii_lowercase, 2)
+        delta = quadgrams.swap_delta(a, b)
+        if delta > 0 or rng.random() < math.exp(delta / temperature):
+            quadgrams.apply_swap(a, b, delta)
+            if quadgrams.score > best_score:
+                best_mapping, best_score = dict(quadgrams.mapping), quadgrams.score
+                if best_score >= task["target"]:
+                    hit = iterations
+                    _record_hit(hit)
+        temperature *= task["cooling_rate"]
+
+    return {"mapping": quadgrams.mapping, "score": quadgrams.score, "temperature": temperature,
+            "best_mapping": best_mapping, "best_score": best_score, "iterations": iterations, "hit": hit}
+
+
+def solve_parallel(text, quadgram_file, chains=4, seed=0, epochs=20, epoch_iterations=500,
+                   sample_size=8000, initial_temp=10.0, cooling_rate=0.999,
+                   target_per_quadgram=-4.6, processes=None):
+    """
+    Run independent simulated annealing chains across a process pool.
+
+    Chain 0 starts from the frequency-analysis mapping, the others from random
+    permutations. Chains run in epochs of epoch_iterations steps; after every
+    epoch the worst chain is replaced by the best mapping found so far. The
+    search stops when a chain's quadgram score reaches target_per_quadgram
+    times the number of quadgrams (None disables this) or after `epochs`.
+    The winner is the chain that got there in the fewest steps of the epoch,
+    lowest chain index on a tie; chains share the earliest hit so far and
+    stop once they have passed it instead of finishing the epoch. The
+    returned mapping is then hill-climbed over all swaps, since reaching
+    the target does not guarantee no letter pair is left swapped.
+    Every chain draws from its own seed derived from `seed`, and epochs are
+    synchronised, so the returned mapping depends only on `seed`, not on
+    process scheduling (only the iteration counts in stats do).
+    processes=0 runs the chains in this process.
+
+    Returns (best_mapping, stats).
+    """
+    rng = random.Random(seed)
+    samples = select_samples(text, sample_size)
+    quadgram_count = sum(max(0, len(QuadgramScorer.encode(sample)) - 3) for sample in samples)
+    target = float('inf') if target_per_quadgram is None else target_per_quadgram * quadgram_count
+
+    letters = string.ascii_lowercase
+    states = [{"mapping": create_initial_mapping(get_letter_frequencies(text), ENGLISH_FREQ_ORDER),
+               "temperature": initial_temp}]
+    for _ in range(1, chains):
+        states.append({"mapping": dict(zip(letters, rng.sample(letters, 26))), "temperature": initial_temp})
+
+    # Nothing resets it between epochs: the search ends with the first epoch that records a hit
+    first_hit = multiprocessing.Value('q', NO_HIT)
+    if processes == 0:
+        _init_worker(quadgram_file, samples, first_hit)
+        pool = None
+        run = lambda tasks: list(map(_anneal_epoch, tasks))
+    else:
+        pool = multiprocessing.Pool(processes or min(chains, os.cpu_count() or 1),
+                                    initializer=_init_worker, initargs=(quadgram_file, samples, first_hit))
+        run = lambda tasks: pool.map(_anneal_epoch, tasks)
+
+    best_mapping, best_score = None, float('-inf')
+    total_iterations = 0
+    converged = False
+    try:
+        for epoch in range(1, epochs + 1):
+            tasks = [{"mapping": state["mapping"], "temperature": state["temperature"],
+                      "iterations": epoch_iterations, "cooling_rate": cooling_rate,
+                      "seed": rng.getrandbits(64), "target": target} for state in states]
+            states = run(tasks)
+            total_iterations += sum(state["iterations"] for state in states)
+
+            hits = [(state["hit"], i) for i, state in enumerate(states) if state["hit"] is not None]
+            if hits:
+                winner = states[min(hits)[1]]
+                best_mapping, best_score = winner["best_mapping"], winner["best_score"]
+                converged = True
+                break
+            for state in states:
+                if state["best_score"] > best_score:
+                    best_mapping, best_score = state["best_mapping"], state["best_score"]
+
+            # Migrate the best mapping into the worst chain
+            worst = min(range(len(states)), key=lambda i: states[i]["score"])
+            states[worst]["mapping"] = dict(best_mapping)
+            states[worst]["score"] = best_score
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    quadgrams = IncrementalQuadgramScore(samples, best_mapping, QuadgramScorer(quadgram_file))
+    quadgram_hill_climb(quadgrams)
+    best_mapping = quadgrams.mapping
+
+    stats = {"score": quadgrams.score, "epochs": epoch, "iterations": total_iterations,
+             "converged": converged, "chain_scores": [state["score"] for state in states]}
+    return best_mapping, stats
+
+
 # --------------------------
 # Password Extraction Logic
 # --------------------------
@@ -264,10 +1124,9 @@ def find_and_decrypt_password_candidates(source1_path, source2_path, source3_pat
     start_time = time.time()
     print("\n[+] Loading files for password extraction...")
     
-    with open(source1_path, 'rb') as f1, open(source2_path, 'rb') as f2, open(source3_path, 'rb') as f3:
-        source1 = f1.read()
-        source2 = f2.read()
-        source3 = f3.read()
+    source1 = load_bytes(source1_path)
+    source2 = load_bytes(source2_path)
+    source3 = load_bytes(source3_path)
 
     print(f"[+] XORing Source-1 and Source-3 to find matching segments...")
     xor_result = xor_bytes(source1, source3)
@@ -288,7 +1147,7 @@ def find_and_decrypt_password_candidates(source1_path, source2_path, source3_pat
             print(f"[!] Skipping segment {idx}: exceeds Source-2 length")
             continue
 
-        encrypted_chunk = source2[pos:pos + length]
+        encrypted_chunk = source2[pos:pos + length].tobytes()
         try:
             encrypted_str = encrypted_chunk.decode('ascii', errors='replace')
         except UnicodeDecodeError:
@@ -326,75 +1185,166 @@ def find_and_decrypt_password_candidates(source1_path, source2_path, source3_pat
     print(f"[+] Password extraction completed in {elapsed:.2f} seconds")
 
 
+# --------------------------
+# Instrumentation
+# --------------------------
+class StageTimer:
+    """
+    Wall-clock timings and counters per pipeline stage, reported as JSON.
+
+        timer = StageTimer()
+        with timer.stage("load") as record:
+            ...
+            record["characters"] = n
+
+    With profile=True every stage also runs under cProfile, and the top
+    functions by cumulative time are kept as text in record["profile"].
+    """
+
+    def __init__(self, profile=False, profile_limit=15):
+        self.profile = profile
+        self.profile_limit = profile_limit
+        self.stages = {}
+        self.start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        record = self.stages.setdefault(name, {})
+        profiler = cProfile.Profile() if self.profile else None
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            record["seconds"] = time.perf_counter() - start
+            if profiler is not None:
+                out = io.StringIO()
+                pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(self.profile_limit)
+                record["profile"] = out.getvalue()
+
+    def report(self):
+        return {"total_seconds": time.perf_counter() - self.start, "stages": self.stages}
+
+    def to_json(self):
+        return json.dumps(self.report(), indent=2)
+
+
 # --------------------------
 # Main Entry Point
 # --------------------------
-def main():
-    total_start_time = time.time()
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Break the substitution cipher of Source-2.")
+    parser.add_argument("--chains", type=int, default=0,
+                        help="Run this many parallel annealing chains instead of a single one")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the solver")
+    parser.add_argument("--staged", action="store_true",
+                        help="Hill-climb on bigrams first, then refine with quadgrams")
+    parser.add_argument("--tabu", type=int, default=0,
+                        help="Do not retry the last N rejected swaps until one is accepted (single-chain annealer)")
+    parser.add_argument("--verbose", action="store_true", help="Print annealing progress")
+    parser.add_argument("--profile", action="store_true", help="Run every stage under cProfile")
+    parser.add_argument("--stats", default=None, help="Write per-stage timings and counters to this JSON file")
+    args = parser.parse_args(argv)
+    if args.chains and args.staged:
+        parser.error("--chains and --staged select different solvers")
+    if args.chains or args.staged:
+        solver_option = "--chains" if args.chains else "--staged"
+        if args.tabu:
+            parser.error(f"--tabu only applies to the single-chain annealer, not {solver_option}")
+        if args.verbose:
+            parser.error(f"--verbose only applies to the single-chain annealer, not {solver_option}")
+
+    timer = StageTimer(profile=args.profile)
     
     print("\n[1] Loading encrypted text...")
-    start_time = time.time()
-    encrypted_text = load_file('Source-2-encrypted.txt')
-    print(f"    - Loaded {len(encrypted_text)} characters in {time.time() - start_time:.2f} seconds")
+    with timer.stage("load_text") as record:
+        encrypted_text = load_file('Source-2-encrypted.txt')
+        record["characters"] = len(encrypted_text)
+    print(f"    - Loaded {len(encrypted_text)} characters in {record['seconds']:.2f} seconds")
 
     print("\n[2] Analyzing frequency...")
-    start_time = time.time()
-    frequencies = get_letter_frequencies(encrypted_text)
-    print(f"    - Frequency analysis completed in {time.time() - start_time:.2f} seconds")
+    with timer.stage("frequency_analysis") as record:
+        frequencies = get_letter_frequencies(encrypted_text)
+    print(f"    - Frequency analysis completed in {record['seconds']:.2f} seconds")
 
     print("\n[3] Creating initial mapping...")
-    start_time = time.time()
-    mapping = create_initial_mapping(frequencies, ENGLISH_FREQ_ORDER)
-    print(f"    - Initial mapping created in {time.time() - start_time:.2f} seconds")
+    with timer.stage("initial_mapping") as record:
+        mapping = create_initial_mapping(frequencies, ENGLISH_FREQ_ORDER)
+    print(f"    - Initial mapping created in {record['seconds']:.2f} seconds")
 
     print("\n[4] Loading quadgram model...")
-    start_time = time.time()
-    scorer = QuadgramScorer('english_quadgrams.txt')
-    print(f"    - Quadgram model loaded in {time.time() - start_time:.2f} seconds")
+    with timer.stage("load_model") as record:
+        scorer = QuadgramScorer('english_quadgrams.txt')
+    print(f"    - Quadgram model loaded in {record['seconds']:.2f} seconds")
 
     print("\n[5] Refining mapping using quadgram scoring and simulated annealing...")
-    # Improved parameters for better results
-    mapping = auto_refine_mapping(
-        encrypted_text, 
-        mapping, 
-        scorer, 
-        max_iterations=2000,       # More iterations for better results
-        sample_size=8000,          # Larger sample for better scoring
-        early_stop=150,            # Allow more attempts without improvement
-        initial_temp=10.0,         # Starting temperature
-        cooling_rate=0.99          # Slow cooling for thorough search
-    )
+    with timer.stage("solve") as record:
+        if args.chains:
+            record["solver"] = "parallel"
+            mapping, stats = solve_parallel(encrypted_text, 'english_quadgrams.txt', chains=args.chains,
+                                            seed=args.seed)
+        elif args.staged:
+            record["solver"] = "staged"
+            mapping, stats = solve_staged(encrypted_text, scorer, seed=args.seed)
+        else:
+            # Shift/affine keys are found in closed form; anything else falls back to annealing
+            random.seed(args.seed)
+            mapping, stats = solve_cascade(
+                encrypted_text,
+                scorer,
+                max_iterations=2000,       # More iterations for better results
+                sample_size=8000,          # Larger sample for better scoring
+                early_stop=150,            # Allow more attempts without improvement
+                initial_temp=10.0,         # Starting temperature
+                cooling_rate=0.99,         # Slow cooling for thorough search
+                tabu_size=args.tabu,
+                verbose=args.verbose
+            )
+            record["solver"] = stats["solver"]
+            if stats["solver"] == "anneal":
+                print(f"    - No shift or affine key fits (best {stats['structured']['kind']} key "
+                      f"{stats['structured']['key']}), annealed instead")
+        # Kept apart from the stage's own fields: solver stats may have their own "seconds"
+        record["stats"] = stats
+    print(f"    - {record['solver']} solver finished in {record['seconds']:.2f} seconds, "
+          f"score {stats['score']:.2f}")
+    print_mapping(mapping)
 
     print("\n[6] Applying final mapping...\n")
-    start_time = time.time()
-    decrypted = apply_mapping(encrypted_text, mapping)
-    decrypt_time = time.time() - start_time
-    print(f"    - Full text decrypted in {decrypt_time:.2f} seconds")
-    
+    # Stream the decryption straight into the output file
+    output_file = "decrypted_output.txt"
+    with timer.stage("decrypt") as record:
+        decrypt_file('Source-2-encrypted.txt', output_file, mapping)
+    print(f"    - Full text decrypted in {record['seconds']:.2f} seconds")
+
     # Show more of the decrypted text for verification
-    preview_length = min(3000, len(decrypted))
-    for chunk in textwrap.wrap(decrypted[:preview_length], width=100):
+    with open(output_file, encoding="utf-8") as f:
+        preview = f.read(3000)
+    for chunk in textwrap.wrap(preview, width=100):
         print(chunk)
 
-    total_time = time.time() - total_start_time
-    print(f"\n[+] Total processing time: {total_time:.2f} seconds")
-
-    # Automatically save the decrypted text
-    output_file = "decrypted_output.txt"
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(decrypted)
+    print(f"\n[+] Total processing time: {timer.report()['total_seconds']:.2f} seconds")
     print(f"[+] Saved decrypted text to '{output_file}'")
 
     # Automatically run password finder
     print("\n[7] Checking for reused OTP password segments...")
-    find_and_decrypt_password_candidates(
-        "Source-1-encrypted.txt",
-        output_file, 
-        "Source-3-encrypted.txt",
-        mapping,
-        scorer,
-        min_length=8
-    )
+    with timer.stage("password_search"):
+        find_and_decrypt_password_candidates(
+            "Source-1-encrypted.txt",
+            output_file, 
+            "Source-3-encrypted.txt",
+            mapping,
+            scorer,
+            min_length=8
+        )
+
+    if args.stats:
+        with open(args.stats, "w") as f:
+            f.write(timer.to_json())
+        print(f"\n[+] Saved stage statistics to '{args.stats}'")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,533 @@
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import re
+import string
+import tempfile
+import unittest
+
+import numpy as np
+
+from decypher import (COMMON_WORDS, ENGLISH_FREQ_ORDER, IncrementalQuadgramScore, IncrementalScore,
+                      IncrementalWordScore, QuadgramScorer, ScoreCache, StageTimer, affine_mapping,
+                      apply_mapping, auto_refine_mapping, bigram_counts, bigram_swap_deltas,
+                      count_common_words, create_initial_mapping, crib_drag, decrypt_file,
+                      find_matching_segments, get_letter_frequencies, load_bytes, load_file, main,
+                      quadgram_indices, solve_cascade, solve_parallel, solve_staged, solve_structured,
+                      swap_mapping, translate_text, xor_bytes)
+
+from benchmark_decypher import bench_annealing, bench_end_to_end, bench_score
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+QUADGRAM_FILE = os.path.join(HERE, 'english_quadgrams.txt')
+# Known plaintext of Source-2 (main() rewrites decrypted_output.txt on every run)
+PLAINTEXT_FILE = os.path.join(HERE, 'Source-2-plaintext.txt')
+
+
+class TestQuadgramScorer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.counts = {"TION": 50, "NTHE": 30, "THER": 15, "THAT": 5}
+        self.path = os.path.join(self.tmpdir.name, 'quadgrams.txt')
+        with open(self.path, 'w') as f:
+            for key, count in self.counts.items():
+                f.write(f"{key} {count}\n")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def reference_score(self, text):
+        """The original dict-based scoring loop."""
+        total = sum(self.counts.values())
+        logs = {k: math.log10(v / total) for k, v in self.counts.items()}
+        floor = math.log10(0.01 / total)
+        text = ''.join(c for c in text.upper() if 'A' <= c <= 'Z')
+        return sum(logs.get(text[i:i + 4], floor) for i in range(len(text) - 3))
+
+    def test_table_layout(self):
+        scorer = QuadgramScorer(self.path)
+        self.assertEqual(scorer.total, 100)
+        self.assertEqual(scorer.table.shape, (26 ** 4,))
+        index = quadgram_indices(np.array([[19, 8, 14, 13]]))[0]  # "TION"
+        self.assertAlmostEqual(scorer.table[index], math.log10(0.5), places=6)
+        self.assertAlmostEqual(scorer.table[0], scorer.floor, places=5)  # "AAAA" unseen
+
+    def test_score_matches_reference(self):
+        scorer = QuadgramScorer(self.path)
+        for text in ["nothe ther, that's the question!", "TiOn", "x", "mention the other"]:
+            self.assertAlmostEqual(scorer.score(text), self.reference_score(text), places=3)
+
+    def test_encode_drops_non_letters(self):
+        np.testing.assert_array_equal(QuadgramScorer.encode("a-B c!z"), [0, 1, 2, 25])
+
+    def test_cache_is_built_then_memory_mapped(self):
+        built = QuadgramScorer(self.path)
+        cache = QuadgramScorer.cache_path(self.path)
+        self.assertTrue(os.path.exists(cache))
+
+        loaded = QuadgramScorer(self.path)
+        self.assertIsInstance(loaded.table, np.memmap)
+        self.assertEqual((loaded.total, loaded.floor), (built.total, built.floor))
+        self.assertEqual(loaded.score("mention the other"), built.score("mention the other"))
+
+    def test_cache_rebuilt_when_source_changes(self):
+        QuadgramScorer(self.path)
+        with open(self.path, 'a') as f:
+            f.write("QUIZ 100\n")
+        scorer = QuadgramScorer(self.path)
+        self.assertEqual(scorer.total, 200)
+        self.assertAlmostEqual(scorer.score("quiz"), math.log10(0.5), places=6)
+
+    def test_no_cache(self):
+        QuadgramScorer(self.path, cache=False)
+        self.assertFalse(os.path.exists(QuadgramScorer.cache_path(self.path)))
+
+    def test_score_rows_matches_score(self):
+        scorer = QuadgramScorer(self.path)
+        texts = [b"mention the other!", b"x1y2 TION ther 3 ?", b"   ....   .... a. "]
+        scores, quadgrams = scorer.score_rows(np.array([list(t) for t in texts], dtype=np.uint8))
+        for text, score, count in zip(texts, scores, quadgrams):
+            self.assertAlmostEqual(score, scorer.score(text.decode()), places=4)
+            self.assertEqual(count, max(0, len(QuadgramScorer.encode(text.decode())) - 3))
+
+    def test_ngram_tables_are_marginals(self):
+        """Lower-order tables are normalised marginals of the quadgram counts."""
+        scorer = QuadgramScorer(self.path, cache=False)
+        unigrams = 10 ** scorer.ngram_table(1)
+        self.assertAlmostEqual(unigrams[scorer.ngram_table(1) > scorer.floor].sum(), 1.0)
+        self.assertAlmostEqual(unigrams[ord('T') - 65], 70 / 100)
+        bigrams = scorer.ngram_table(2)
+        self.assertAlmostEqual(10 ** bigrams[19 * 26 + 7], 20 / 100)   # TH
+        self.assertAlmostEqual(10 ** bigrams[13 * 26 + 19], 30 / 100)  # NT
+        self.assertEqual(bigrams[0], scorer.floor)
+        self.assertEqual(scorer.ngram_table(3).shape, (26 ** 3,))
+
+    def test_ngram_tables_when_float32_floor_rounds_up(self):
+        """With a total of 12 the float32 floor lies above the float64 one; unseen entries stay unseen."""
+        with open(self.path, 'w') as f:
+            f.write("TION 7\nNTHE 5\n")
+        scorer = QuadgramScorer(self.path, cache=False)
+        self.assertGreater(float(scorer.table[0]), scorer.floor)
+        unigrams = scorer.ngram_table(1)
+        self.assertEqual(np.count_nonzero(unigrams != scorer.floor), 2)
+        self.assertAlmostEqual(10 ** unigrams[ord('T') - 65], 7 / 12)
+
+    def test_english_scores_above_gibberish(self):
+        scorer = QuadgramScorer(QUADGRAM_FILE)
+        english = "it did always seem so to us but now in the division of the kingdom"
+        gibberish = "qzx vjkw pqzm xxqj vkzq wjxv qzpk jvxq zmqw kjzx vqpz wkqj xzvm qjkw"
+        self.assertGreater(scorer.score(english), scorer.score(gibberish))
+
+
+
+class TestIncrementalQuadgramScore(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.scorer = QuadgramScorer(QUADGRAM_FILE)
+        with open(os.path.join(HERE, 'Source-2-encrypted.txt')) as f:
+            text = f.read().lower()
+        cls.samples = [text[:2000], text[-2000:]]
+
+    def full_score(self, mapping):
+        return sum(self.scorer.score(apply_mapping(sample, mapping)) for sample in self.samples)
+
+    def test_swap_delta_matches_full_rescore(self):
+        rng = random.Random(0)
+        mapping = dict(zip(string.ascii_lowercase, rng.sample(string.ascii_lowercase, 26)))
+        engine = IncrementalQuadgramScore(self.samples, mapping, self.scorer)
+        self.assertAlmostEqual(engine.score, self.full_score(mapping), places=2)
+
+        for _ in range(50):
+            a, b = rng.sample(string.ascii_lowercase, 2)
+            trial = swap_mapping(mapping, a, b)
+            delta = engine.swap_delta(a, b)
+            self.assertAlmostEqual(delta, self.full_score(trial) - self.full_score(mapping), places=2)
+            if rng.random() < 0.5:
+                engine.apply_swap(a, b, delta)
+                mapping = trial
+
+        self.assertEqual(engine.mapping, mapping)
+        self.assertAlmostEqual(engine.score, self.full_score(mapping), places=2)
+
+    def test_partial_mapping(self):
+        """Unmapped cipher letters decrypt to themselves, as in apply_mapping."""
+        mapping = {'g': 't', 'h': 'h', 'b': 'e'}
+        engine = IncrementalQuadgramScore(self.samples, mapping, self.scorer)
+        self.assertAlmostEqual(engine.score, self.full_score(mapping), places=2)
+        delta = engine.swap_delta('t', 'x')  # 'x' is not a mapped value
+        self.assertAlmostEqual(delta, self.full_score(swap_mapping(mapping, 't', 'x')) - engine.score, places=2)
+
+    def test_subclass_must_implement_unit_values(self):
+        class NoValues(IncrementalScore):
+            pass
+
+        with self.assertRaises(TypeError):
+            NoValues(np.zeros((1, 4), dtype=np.intp), {})
+
+
+    def test_word_score_matches_count_common_words(self):
+        with open(PLAINTEXT_FILE) as f:
+            plaintext = f.read()
+        # Invert the known solution of the first sample to get its key
+        mapping = {}
+        for c, p in zip(self.samples[0], plaintext):
+            if c in string.ascii_lowercase:
+                mapping[c] = p
+        full = lambda m: sum(count_common_words(apply_mapping(s, m)) for s in self.samples) * 5
+
+        engine = IncrementalWordScore(self.samples, mapping, weight=5)
+        self.assertGreater(engine.score, 0)
+        self.assertEqual(engine.score, full(mapping))
+
+        rng = random.Random(1)
+        for _ in range(50):
+            a, b = rng.sample(string.ascii_lowercase, 2)
+            delta = engine.swap_delta(a, b)
+            self.assertEqual(delta, full(swap_mapping(mapping, a, b)) - full(mapping))
+            if rng.random() < 0.2:
+                engine.apply_swap(a, b, delta)
+                mapping = swap_mapping(mapping, a, b)
+        self.assertEqual(engine.score, full(mapping))
+
+
+class TestScoreCache(unittest.TestCase):
+
+    def test_swapped_fingerprint_matches_swapped_mapping(self):
+        mapping = {c: p for c, p in zip(string.ascii_lowercase, 'qwertyuiopasdfghjklzxcvbnm')}
+        for a, b in [('a', 'b'), ('e', 'z'), ('q', 'm')]:
+            self.assertEqual(ScoreCache.swapped(ScoreCache.fingerprint(mapping), a, b),
+                             ScoreCache.fingerprint(swap_mapping(mapping, a, b)))
+
+    def test_lru_eviction(self):
+        cache = ScoreCache(maxsize=2)
+        cache.put(b'a', 1)
+        cache.put(b'b', 2)
+        self.assertEqual(cache.get(b'a'), 1)
+        cache.put(b'c', 3)
+        self.assertIsNone(cache.get(b'b'))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(cache.hit_rate, 0.5)
+
+    def test_cache_keeps_annealing_trajectory(self):
+        """Memoized scores give the same result as rescoring every trial."""
+        scorer = QuadgramScorer(QUADGRAM_FILE)
+        with open(os.path.join(HERE, 'Source-2-encrypted.txt')) as f:
+            text = f.read().lower()
+        initial = create_initial_mapping(get_letter_frequencies(text), ENGLISH_FREQ_ORDER)
+        results = []
+        for cache in (ScoreCache(maxsize=0), ScoreCache()):
+            random.seed(5)
+            results.append(auto_refine_mapping(text, initial, scorer, max_iterations=300, sample_size=3000,
+                                               cache=cache))
+        self.assertEqual(results[0], results[1])
+        self.assertGreater(cache.hits, 0)
+
+    def test_tabu_does_not_hurt_solve_rate(self):
+        """Over the same seeds the tabu list solves Source-2 at least as often as plain annealing."""
+        scorer = QuadgramScorer(QUADGRAM_FILE)
+        text = load_file(os.path.join(HERE, 'Source-2-encrypted.txt'))
+        with open(PLAINTEXT_FILE) as f:
+            plaintext = f.read()[:2000]
+        initial = create_initial_mapping(get_letter_frequencies(text), ENGLISH_FREQ_ORDER)
+        solved = {}
+        for tabu_size in (0, 10, 324):
+            solved[tabu_size] = 0
+            for seed in range(8):
+                random.seed(seed)
+                mapping = auto_refine_mapping(text, initial, scorer, sample_size=3000, tabu_size=tabu_size)
+                solved[tabu_size] += apply_mapping(text[:2000], mapping) == plaintext
+        self.assertGreaterEqual(solved[10], solved[0])
+        self.assertGreaterEqual(solved[324], solved[0])
+
+    def test_oversized_tabu_terminates(self):
+        """A tabu list longer than the 325 letter pairs is capped, so a free pair always remains."""
+        scorer = QuadgramScorer(QUADGRAM_FILE)
+        text = load_file(os.path.join(HERE, 'Source-2-encrypted.txt'))[:3000]
+        random.seed(0)
+        stats = {}
+        auto_refine_mapping(text, {}, scorer, max_iterations=2000, early_stop=2001, initial_temp=1e-9,
+                            tabu_size=1000, stats=stats)
+        self.assertEqual(stats["iterations"], 2000)
+
+
+class TestCountCommonWords(unittest.TestCase):
+
+    def test_matches_per_word_regex(self):
+        def reference(text):
+            text = text.lower()
+            return sum(len(re.findall(r'\b' + re.escape(word) + r'\b', text)) for word in COMMON_WORDS)
+
+        for text in ["The_the there,THE. the1 that's you're", "And then THEY said: 'with all your will'",
+                     "cathedral hisses thisthe"]:
+            self.assertEqual(count_common_words(text), reference(text))
+
+
+class TestOneTimePadAnalysis(unittest.TestCase):
+
+    def reference_segments(self, xor_data, min_length):
+        """The original byte-by-byte loop."""
+        matches, start = [], None
+        for i, byte in enumerate(list(xor_data) + [1]):
+            if byte == 0 and start is None:
+                start = i
+            elif byte != 0 and start is not None:
+                if i - start >= min_length:
+                    matches.append((start, i - start))
+                start = None
+        return matches
+
+    def test_xor_bytes_accepts_bytes_and_memmaps(self):
+        self.assertEqual(xor_bytes(b"\x0f\xf0\xaa", b"\xff\xff").tobytes(), b"\xf0\x0f")
+        path = os.path.join(HERE, 'Source-1-encrypted.txt')
+        with open(path, 'rb') as f:
+            raw = f.read()
+        mapped = load_bytes(path)
+        self.assertIsInstance(mapped, np.memmap)
+        np.testing.assert_array_equal(xor_bytes(mapped, raw), np.zeros(len(raw), dtype=np.uint8))
+
+    def test_find_matching_segments_matches_loop(self):
+        rng = np.random.default_rng(0)
+        for _ in range(100):
+            length = rng.integers(0, 200)
+            data = ((rng.random(length) < 0.6) * rng.integers(1, 256, length)).astype(np.uint8)
+            for block_size in (1, 3, 16, 1 << 24):
+                for min_length in (1, 4):
+                    self.assertEqual(find_matching_segments(data, min_length, block_size),
+                                     self.reference_segments(data, min_length))
+
+    def test_source1_and_source3_share_a_segment(self):
+        xor_data = xor_bytes(load_bytes(os.path.join(HERE, 'Source-1-encrypted.txt')),
+                             load_bytes(os.path.join(HERE, 'Source-3-encrypted.txt')))
+        self.assertEqual(find_matching_segments(xor_data, 8), [(69980, 20)])
+
+    def test_crib_drag_recovers_other_plaintext(self):
+        scorer = QuadgramScorer(QUADGRAM_FILE)
+        p1 = b"we attack at dawn from the northern gate, bring the horses and the archers"
+        p2 = b"meet me by the old mill tonight, tell nobody that the treasure is still there"
+        key = np.random.default_rng(1).integers(0, 256, len(p2), dtype=np.uint8).tobytes()
+        c1 = xor_bytes(p1, key)
+        c2 = xor_bytes(p2, key)
+
+        offset = p1.index(b"northern gate")
+        results = crib_drag(xor_bytes(c1, c2), "northern gate", scorer, top=3)
+        self.assertEqual(results[0][0], offset)
+        self.assertEqual(results[0][2], p2[offset:offset + 13].decode())
+
+
+class TestDecryption(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        rng = random.Random(0)
+        self.mapping = dict(zip(string.ascii_lowercase, rng.sample(string.ascii_lowercase, 26)))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_apply_mapping(self):
+        mapping = {'a': 'b', 'b': 'a', 'Q': 'z'}
+        self.assertEqual(apply_mapping("abc ABC Qq!", mapping), "bac BA? zq!")
+
+    def test_translate_text_uses_uppercase_keys(self):
+        self.assertEqual(translate_text("Abc abc 1", {'A': 'X', 'B': 'Y', '1': 'Q'}), "Xyc xyc q")
+        self.assertEqual(translate_text("abc", {'a': 'x'}), "abc")
+
+    def test_decrypt_file_matches_apply_mapping(self):
+        src = os.path.join(self.tmpdir.name, 'cipher.txt')
+        dst = os.path.join(self.tmpdir.name, 'plain.txt')
+        text = "Plain ASCII Text, then ÉCOLE ünïcode Straße.\n" * 50
+        with open(src, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+        expected = apply_mapping(load_file(src), self.mapping)
+        for chunk_size in (1, 3, 64, 1 << 20):
+            decrypt_file(src, dst, self.mapping, chunk_size=chunk_size)
+            with open(dst, encoding='utf-8') as f:
+                self.assertEqual(f.read(), expected)
+
+    def test_decrypt_file_translates_newlines_like_load_file(self):
+        src = os.path.join(self.tmpdir.name, 'cipher.txt')
+        dst = os.path.join(self.tmpdir.name, 'plain.txt')
+        with open(src, 'wb') as f:
+            f.write(b"Ab c\r\nde\rfg\n\r\r\nhi" * 20)
+
+        expected = apply_mapping(load_file(src), self.mapping).encode('utf-8')
+        for chunk_size in (1, 2, 5, 1 << 20):
+            decrypt_file(src, dst, self.mapping, chunk_size=chunk_size)
+            with open(dst, 'rb') as f:
+                self.assertEqual(f.read(), expected)
+
+    def test_decrypt_file_non_ascii_output(self):
+        src = os.path.join(self.tmpdir.name, 'cipher.txt')
+        dst = os.path.join(self.tmpdir.name, 'plain.txt')
+        with open(src, 'w', encoding='utf-8') as f:
+            f.write("Banana")
+        decrypt_file(src, dst, {'a': 'ä'}, chunk_size=2)
+        with open(dst, encoding='utf-8') as f:
+            self.assertEqual(f.read(), "bänänä")
+
+
+class TestStructuredSolver(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.scorer = QuadgramScorer(QUADGRAM_FILE)
+        with open(PLAINTEXT_FILE) as f:
+            cls.plaintext = f.read()[:3000]
+
+    def encrypt(self, a, b):
+        return apply_mapping(self.plaintext, {v: k for k, v in affine_mapping(a, b).items()})
+
+    def test_recovers_shift_and_affine_keys(self):
+        for a, b, kind in [(1, 3, "shift"), (1, 0, "shift"), (7, 11, "affine"), (25, 25, "affine")]:
+            mapping, stats = solve_structured(self.encrypt(a, b), self.scorer)
+            self.assertTrue(stats["accepted"])
+            self.assertEqual((stats["kind"], stats["key"]), (kind, [a, b]))
+            self.assertEqual(apply_mapping(self.encrypt(a, b), mapping), self.plaintext)
+
+    def test_shift_only(self):
+        _, stats = solve_structured(self.encrypt(7, 11), self.scorer, affine=False)
+        self.assertEqual(stats["kind"], "shift")
+        self.assertFalse(stats["accepted"])
+
+    def test_cascade_skips_annealing_for_caesar(self):
+        mapping, stats = solve_cascade(self.encrypt(1, 13), self.scorer)
+        self.assertEqual(stats["solver"], "shift")
+        self.assertEqual(apply_mapping(self.encrypt(1, 13), mapping), self.plaintext)
+
+    def test_cascade_falls_back_for_general_substitution(self):
+        """Source-2 is a general substitution, so no structured key fits."""
+        text = load_file(os.path.join(HERE, 'Source-2-encrypted.txt'))
+        random.seed(0)
+        mapping, stats = solve_cascade(text, self.scorer)
+        self.assertEqual(stats["solver"], "anneal")
+        self.assertFalse(stats["structured"]["accepted"])
+        self.assertEqual(apply_mapping(text[:500], mapping), self.plaintext[:500])
+
+
+class TestParallelSolver(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(os.path.join(HERE, 'Source-2-encrypted.txt')) as f:
+            cls.text = f.read().lower()
+        with open(PLAINTEXT_FILE) as f:
+            cls.plaintext = f.read()
+
+    def test_solves_source2_and_is_reproducible(self):
+        kwargs = dict(chains=3, seed=7, epochs=10, sample_size=3000)
+        mapping, stats = solve_parallel(self.text, QUADGRAM_FILE, processes=0, **kwargs)
+        self.assertTrue(stats["converged"])
+        self.assertEqual(apply_mapping(self.text[:500], mapping), self.plaintext[:500])
+        self.assertEqual(solve_parallel(self.text, QUADGRAM_FILE, processes=0, **kwargs), (mapping, stats))
+
+        # How far the other chains get before one converges depends on scheduling; the winner does not
+        for processes in (2, 3):
+            pooled_mapping, pooled_stats = solve_parallel(self.text, QUADGRAM_FILE, processes=processes, **kwargs)
+            self.assertTrue(pooled_stats["converged"])
+            self.assertEqual(pooled_stats["score"], stats["score"])
+            self.assertEqual(pooled_mapping, mapping)
+
+    def test_solves_source2_with_default_arguments(self):
+        """Reaching the target alone can leave a letter pair swapped; the final hill-climb fixes it."""
+        for seed in (0, 2, 6, 9):
+            with self.subTest(seed=seed):
+                mapping, stats = solve_parallel(self.text, QUADGRAM_FILE, seed=seed, processes=0)
+                self.assertTrue(stats["converged"])
+                self.assertEqual(apply_mapping(self.text, mapping), self.plaintext)
+
+    def test_chains_stop_when_one_converges(self):
+        """Chain 0 converges within one long epoch; the chains after it never run."""
+        _, stats = solve_parallel(self.text, QUADGRAM_FILE, chains=3, seed=7, epochs=1, epoch_iterations=20000,
+                                  sample_size=3000, processes=0)
+        self.assertTrue(stats["converged"])
+        self.assertLess(stats["iterations"], 20000)
+
+
+class TestStagedSolver(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.scorer = QuadgramScorer(QUADGRAM_FILE)
+        with open(os.path.join(HERE, 'Source-2-encrypted.txt')) as f:
+            cls.text = f.read().lower()
+        with open(PLAINTEXT_FILE) as f:
+            cls.plaintext = f.read()
+
+    def test_bigram_swap_deltas_match_full_rescore(self):
+        counts = bigram_counts(self.text[:5000])
+        log_bigrams = self.scorer.ngram_table(2).reshape(26, 26)
+        full = lambda p: (counts * log_bigrams[np.ix_(p, p)]).sum()
+        rng = np.random.default_rng(1)
+        for _ in range(3):
+            perm = rng.permutation(26)
+            expected = np.zeros((26, 26))
+            for x in range(26):
+                for y in range(26):
+                    if x != y:
+                        swapped = perm.copy()
+                        swapped[x], swapped[y] = perm[y], perm[x]
+                        expected[x, y] = full(swapped) - full(perm)
+            np.testing.assert_allclose(bigram_swap_deltas(counts, log_bigrams, perm), expected, atol=1e-6)
+
+    def test_solves_source2_with_one_quadgram_pass(self):
+        """The bigram stage lands close enough that quadgrams only need one pass of swaps."""
+        mapping, stats = solve_staged(self.text, self.scorer, sample_size=3000, restarts=2)
+        self.assertEqual(apply_mapping(self.text[:500], mapping), self.plaintext[:500])
+        self.assertLessEqual(stats["quadgram_evaluations"], 2 * 325)
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def test_stage_timer_records_stages(self):
+        timer = StageTimer(profile=True, profile_limit=5)
+        with timer.stage("work") as record:
+            record["items"] = sum(range(1000))
+        report = json.loads(timer.to_json())
+        self.assertEqual(list(report["stages"]), ["work"])
+        self.assertEqual(report["stages"]["work"]["items"], 499500)
+        self.assertGreaterEqual(report["stages"]["work"]["seconds"], 0)
+        self.assertIn("cumulative", report["stages"]["work"]["profile"])
+
+    def test_auto_refine_is_quiet_and_reports_stats(self):
+        scorer = QuadgramScorer(QUADGRAM_FILE)
+        with open(os.path.join(HERE, 'Source-2-encrypted.txt')) as f:
+            text = f.read().lower()
+        initial = create_initial_mapping(get_letter_frequencies(text), ENGLISH_FREQ_ORDER)
+        stats = {}
+        random.seed(0)
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            auto_refine_mapping(text, initial, scorer, max_iterations=200, sample_size=3000, early_stop=201,
+                                stats=stats)
+        self.assertEqual(out.getvalue(), "")
+        self.assertEqual(stats["iterations"], 200)
+        self.assertEqual(stats["quadgram_evaluations"], stats["cache_misses"])
+        self.assertEqual(stats["cache_hits"] + stats["cache_misses"], 200)
+        self.assertGreater(stats["iterations_per_second"], 0)
+
+    def test_main_rejects_options_the_solver_ignores(self):
+        for argv, option in [(["--chains", "2", "--staged"], "--staged"),
+                             (["--chains", "2", "--tabu", "10"], "--tabu"),
+                             (["--staged", "--verbose"], "--verbose")]:
+            with self.subTest(argv=argv), contextlib.redirect_stderr(io.StringIO()) as err:
+                with self.assertRaises(SystemExit):
+                    main(argv)
+                self.assertIn(option, err.getvalue())
+
+    def test_benchmarks(self):
+        scorer = QuadgramScorer(QUADGRAM_FILE)
+        text = load_file(os.path.join(HERE, 'Source-2-encrypted.txt'))
+        self.assertGreater(bench_score(scorer, text, repeat=1)["seconds_per_call"], 0)
+        self.assertEqual(bench_annealing(scorer, text, iterations=100)["iterations"], 100)
+        with open(PLAINTEXT_FILE) as f:
+            reference = f.read()
+        self.assertTrue(bench_end_to_end("anneal", reference)["solved"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from triage import clusters_from_pairs, triage
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestTriage(unittest.TestCase):
+
+    def test_bundled_sources(self):
+        """Source-2 is the substitution cipher; Source-1 and Source-3 share an OTP key."""
+        paths = [os.path.join(HERE, f'Source-{i}-encrypted.txt') for i in (1, 2, 3)]
+        report = triage(paths, jobs=1)
+        self.assertEqual([f["classification"] for f in report["files"]], ["otp", "substitution", "otp"])
+        self.assertEqual(report["clusters"], [[paths[0], paths[2]]])
+
+    def test_batch_clusters(self):
+        """Files encrypted with the same key end up in one cluster, others stay alone."""
+        with open(os.path.join(HERE, 'Source-2-plaintext.txt'), 'rb') as f:
+            plaintext = np.frombuffer(f.read(), dtype=np.uint8)
+        rng = np.random.default_rng(3)
+        keys = [rng.integers(0, 256, 20000, dtype=np.uint8) for _ in range(4)]
+        key_of_file = [0, 1, 0, 2, 1, 3, 0]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = []
+            for i, key in enumerate(key_of_file):
+                path = os.path.join(tmpdir, f'cipher-{i}.bin')
+                start = i * 20000
+                with open(path, 'wb') as f:
+                    f.write((plaintext[start:start + 20000] ^ keys[key]).tobytes())
+                paths.append(path)
+            # A plain-text file among the ciphertexts
+            text_path = os.path.join(tmpdir, 'notes.txt')
+            with open(text_path, 'wb') as f:
+                f.write(plaintext[:5000].tobytes())
+            paths.append(text_path)
+
+            report = triage(paths, samples=2048, jobs=2)
+
+        classifications = [f["classification"] for f in report["files"]]
+        self.assertEqual(classifications, ["otp"] * 7 + ["substitution"])
+        clusters = sorted(sorted(os.path.basename(p) for p in group) for group in report["clusters"])
+        self.assertEqual(clusters, [['cipher-0.bin', 'cipher-2.bin', 'cipher-6.bin'],
+                                    ['cipher-1.bin', 'cipher-4.bin']])
+
+    def test_clusters_from_pairs(self):
+        self.assertEqual(clusters_from_pairs(6, [(0, 3), (3, 5), (1, 2)]), [[0, 3, 5], [1, 2]])
+
+
+if __name__ == '__main__':
+    unittest.main()
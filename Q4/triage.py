@@ -0,0 +1,191 @@
+"""
+Batch triage of ciphertext files.
+
+Classifies every file as a substitution cipher, a one-time pad or unknown
+from a few per-file statistics, then finds every pair of one-time-pad files
+encrypted with the same key, and reports the key-sharing clusters.
+
+Key reuse is detected from byte coincidences: if c1 = p1 ^ k and c2 = p2 ^ k
+then c1 == c2 exactly where p1 == p2, which for natural text happens more than
+ten times as often as the 1/256 expected for independent keys. Only a fixed
+set of sampled offsets is compared, so the pairwise stage costs N^2 * S for
+S samples instead of N^2 * L for files of length L.
+
+Usage:
+    python triage.py Source-*-encrypted.txt
+    python triage.py ciphertexts/ --jobs 8 --output report.json
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+
+import numpy as np
+
+from decypher import load_bytes
+
+# Classification thresholds
+SUBSTITUTION_MIN_PRINTABLE = 0.95
+SUBSTITUTION_MIN_IOC = 0.055      # English ~0.066, uniform letters ~0.038
+OTP_MAX_PRINTABLE = 0.6           # uniform bytes are ~38% printable
+OTP_MIN_ENTROPY_RATIO = 0.9       # of the maximum entropy measurable for the file size
+SHARED_KEY_MIN_Z = 6.0            # coincidence z-score over the 1/256 random baseline
+
+
+def file_statistics(path, data=None):
+    """Index of coincidence, byte entropy and printable ratio of one file."""
+    if data is None:
+        data = load_bytes(path)
+    size = len(data)
+    counts = np.bincount(data, minlength=256).astype(np.float64)
+
+    probabilities = counts[counts > 0] / max(1, size)
+    entropy = float(-(probabilities * np.log2(probabilities)).sum())
+    printable = counts[32:127].sum() + counts[9] + counts[10] + counts[13]
+
+    letters = counts[65:91] + counts[97:123]
+    letter_total = letters.sum()
+    ioc = float((letters * (letters - 1)).sum() / (letter_total * (letter_total - 1))) if letter_total > 1 else 0.0
+
+    return {
+        "path": path,
+        "size": size,
+        "entropy": entropy,
+        "printable_ratio": float(printable / size) if size else 0.0,
+        "letter_ratio": float(letter_total / size) if size else 0.0,
+        "ioc": ioc,
+    }
+
+
+def classify(stats):
+    """Return "substitution", "otp" or "unknown" for file_statistics output."""
+    if stats["size"] == 0:
+        return "unknown"
+    if stats["printable_ratio"] >= SUBSTITUTION_MIN_PRINTABLE and stats["ioc"] >= SUBSTITUTION_MIN_IOC:
+        return "substitution"
+    max_entropy = min(8.0, math.log2(stats["size"])) if stats["size"] > 1 else 0.0
+    if stats["printable_ratio"] <= OTP_MAX_PRINTABLE and stats["entropy"] >= OTP_MIN_ENTROPY_RATIO * max_entropy:
+        return "otp"
+    return "unknown"
+
+
+def sample_offsets(max_length, samples, seed=0):
+    """Offsets compared between files: a dense prefix plus random offsets over the rest."""
+    rng = np.random.default_rng(seed)
+    prefix = np.arange(min(samples // 2, max_length))
+    spread = rng.integers(0, max_length, samples - len(prefix)) if max_length else np.zeros(0, dtype=int)
+    return np.unique(np.concatenate([prefix, spread]))
+
+
+def _analyse(task):
+    path, offsets = task
+    data = load_bytes(path)
+    stats = file_statistics(path, data)
+    stats["classification"] = classify(stats)
+
+    valid = offsets < len(data)
+    sample = np.zeros(len(offsets), dtype=np.uint8)
+    sample[valid] = data[offsets[valid]]
+    return stats, sample, valid
+
+
+def find_shared_keys(samples, valid, min_z=SHARED_KEY_MIN_Z):
+    """
+    Compare every pair of sampled rows and return those with too many coincidences.
+
+    samples and valid are (N, S) arrays; returns (i, j, coincidences, compared, z) tuples.
+    """
+    pairs = []
+    p = 1 / 256
+    for i in range(len(samples) - 1):
+        both = valid[i] & valid[i + 1:]
+        compared = both.sum(axis=1)
+        coincidences = ((samples[i] == samples[i + 1:]) & both).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = (coincidences - compared * p) / np.sqrt(compared * p * (1 - p))
+        for k in np.flatnonzero(z >= min_z):
+            pairs.append((i, i + 1 + int(k), int(coincidences[k]), int(compared[k]), float(z[k])))
+    return pairs
+
+
+def clusters_from_pairs(count, pairs):
+    """Group indices linked by pairs (union-find); return groups of two or more."""
+    parent = list(range(count))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j, *_ in pairs:
+        parent[find(i)] = find(j)
+
+    groups = {}
+    for i in range(count):
+        groups.setdefault(find(i), []).append(i)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def triage(paths, samples=4096, jobs=None, seed=0):
+    """Classify every file and find key-sharing clusters among the one-time-pad files."""
+    max_length = max((os.path.getsize(path) for path in paths), default=0)
+    offsets = sample_offsets(max_length, samples, seed)
+    tasks = [(path, offsets) for path in paths]
+
+    if jobs == 1:
+        results = list(map(_analyse, tasks))
+    else:
+        with multiprocessing.Pool(jobs) as pool:
+            results = pool.map(_analyse, tasks, chunksize=max(1, len(tasks) // (4 * (jobs or os.cpu_count() or 1))))
+
+    files = [stats for stats, _, _ in results]
+    otp = [i for i, stats in enumerate(files) if stats["classification"] == "otp"]
+    otp_samples = np.array([results[i][1] for i in otp]).reshape(len(otp), len(offsets))
+    otp_valid = np.array([results[i][2] for i in otp]).reshape(len(otp), len(offsets))
+
+    pairs = [(otp[i], otp[j], coincidences, compared, z)
+             for i, j, coincidences, compared, z in find_shared_keys(otp_samples, otp_valid)]
+
+    return {
+        "files": files,
+        "shared_key_pairs": [{"a": paths[i], "b": paths[j], "coincidences": coincidences,
+                              "compared": compared, "z": z}
+                             for i, j, coincidences, compared, z in pairs],
+        "clusters": [[paths[i] for i in group] for group in clusters_from_pairs(len(paths), pairs)],
+    }
+
+
+def expand_paths(paths):
+    """Expand directories into the files they contain (non-recursive)."""
+    expanded = []
+    for path in paths:
+        if os.path.isdir(path):
+            expanded.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                   if os.path.isfile(os.path.join(path, name))))
+        else:
+            expanded.append(path)
+    return expanded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify ciphertext files and find reused one-time pads.")
+    parser.add_argument("paths", nargs="+", help="Ciphertext files or directories")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--samples", type=int, default=4096, help="Byte offsets compared per pair")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write the JSON report here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    report = triage(expand_paths(args.paths), samples=args.samples, jobs=args.jobs, seed=args.seed)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()